@@ -0,0 +1,392 @@
+"""
+benchmark.py
+
+Benchmarks for the detection hot path on seeded synthetic multilingual corpora.
+
+Covers detect_bias_terms, bias_score, toxicity_score, score_batch,
+constitution_aware_decode, run_demo and the segregate_tweets pipeline
+(in-memory and streamed). Also runs scaling sweeps over KB size and corpus size.
+Each case reports throughput, p50/p99 latency and tracemalloc peak memory, and
+the whole run is written as JSON.
+
+    python benchmark.py --output bench.json                 # run and save
+    python benchmark.py --baseline bench.json               # compare; exit 1 on regression
+    python benchmark.py --quick --baseline bench.json --tolerance 0.3
+    python benchmark.py --imports-only                      # import-time budget only
+
+Every run first checks the import-time budget: each module in IMPORT_BUDGETS_MS
+must import within its budget and without pandas/numpy/tweepy/requests.
+
+Corpora are generated from `--seed`, so runs on the same commit see the same
+texts. Timings are still machine-dependent, so compare against a baseline
+recorded on the same machine.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+import costitu2
+import segregate_tweets
+
+# ---------------------------
+# Synthetic corpora
+# ---------------------------
+SCRIPT_ALPHABETS = {
+    "english": "abcdefghijklmnopqrstuvwxyz",
+    "hindi": "".join(map(chr, range(0x0915, 0x0939))) + "ािीुूेैोौ्",
+    "telugu": "".join(map(chr, range(0x0C15, 0x0C39))) + "ాిీుూెేొో్",
+    "tamil": "கஙசஞடணதநபமயரலவழளறன" + "ாிீுூெேைொோ்",
+    "bengali": "".join(map(chr, range(0x0995, 0x09B9))) + "ািীুূেৈোৌ্",
+}
+# share of texts whose main language is each KB language
+LANGUAGE_WEIGHTS = {"english": 0.4, "hindi": 0.2, "telugu": 0.15, "tamil": 0.1, "bengali": 0.15}
+ENGLISH_WORDS = (
+    "the people of this city voted today and many leaders spoke about jobs roads water "
+    "prices schools farmers workers rally festival news government policy election youth "
+    "market temple village district state national local support against protest"
+).split()
+TEXT_LENGTHS = {"short": (4, 12), "medium": (15, 40), "long": (60, 120)}  # words
+
+
+def _fake_word(rng, language, lo=2, hi=7):
+    alphabet = SCRIPT_ALPHABETS[language]
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(lo, hi)))
+
+
+def _filler_word(rng, language):
+    if language == "english":
+        return rng.choice(ENGLISH_WORDS)
+    return _fake_word(rng, language)
+
+
+def _typo(rng, term):
+    """Replace one character, so the term only matches fuzzily."""
+    if len(term) < 4:
+        return term
+    i = rng.randrange(len(term))
+    return term[:i] + rng.choice(term) + term[i + 1:]
+
+
+def make_corpus(n, seed=0, hit_rate=0.2, lengths=tuple(TEXT_LENGTHS), mixed_rate=0.2,
+                kb=costitu2.KNOWLEDGE_BASE, latin_to_native=costitu2.LATIN_TO_NATIVE):
+    """`n` seeded synthetic texts.
+
+    Each text has a main language drawn from LANGUAGE_WEIGHTS and a length bucket
+    from `lengths`. With probability `mixed_rate` it also contains words in a second
+    script. With probability `hit_rate` it contains a KB term (or Latin key) of its
+    language, 30% of them with a one-character typo.
+    """
+    rng = random.Random(seed)
+    languages = list(LANGUAGE_WEIGHTS)
+    weights = list(LANGUAGE_WEIGHTS.values())
+    latin_keys = sorted(latin_to_native)
+    texts = []
+    for _ in range(n):
+        language = rng.choices(languages, weights)[0]
+        lo, hi = TEXT_LENGTHS[rng.choice(lengths)]
+        words = [_filler_word(rng, language) for _ in range(rng.randint(lo, hi))]
+        if rng.random() < mixed_rate:
+            other = rng.choice([l for l in languages if l != language])
+            for _ in range(rng.randint(1, 3)):
+                words.insert(rng.randrange(len(words) + 1), _filler_word(rng, other))
+        if rng.random() < hit_rate:
+            pool = kb.get(language) or latin_keys
+            if language == "english" and rng.random() < 0.5:
+                pool = latin_keys
+            term = rng.choice(pool)
+            if rng.random() < 0.3:
+                term = _typo(rng, term)
+            words.insert(rng.randrange(len(words) + 1), term)
+        texts.append(" ".join(words))
+    return texts
+
+
+def make_kb(scale, seed=0):
+    """KNOWLEDGE_BASE / LATIN_TO_NATIVE grown to about `scale` times their size with synthetic terms."""
+    rng = random.Random(seed)
+    kb = {lang: list(terms) for lang, terms in costitu2.KNOWLEDGE_BASE.items()}
+    l2n = {key: dict(v) for key, v in costitu2.LATIN_TO_NATIVE.items()}
+    for lang, terms in costitu2.KNOWLEDGE_BASE.items():
+        for _ in range(int(len(terms) * (scale - 1))):
+            kb[lang].append(_fake_word(rng, lang if lang in SCRIPT_ALPHABETS else "english", 3, 9))
+    for _ in range(int(len(costitu2.LATIN_TO_NATIVE) * (scale - 1))):
+        key = _fake_word(rng, "english", 4, 10)
+        langs = rng.sample([l for l in kb if l != "english"], rng.randint(1, 3))
+        l2n[key] = {lang: rng.choice(kb[lang]) for lang in langs}
+    return kb, l2n
+
+
+# ---------------------------
+# Measurement
+# ---------------------------
+def _percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def _peak_memory(fn, args):
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(fn, items, per_item=True, repeat=1, memory_items=200):
+    """Time `fn` over `items` and measure its peak traced memory.
+
+    per_item: latencies are per `fn(item)` call; otherwise `fn(items)` is one call
+    (repeated `repeat` times) and throughput counts items per second. Peak memory is
+    measured in a separate, untimed run (over the first `memory_items` items when
+    per_item) so tracing overhead does not skew the timings.
+    """
+    latencies = []
+    if per_item:
+        for _ in range(repeat):
+            for item in items:
+                t = time.perf_counter()
+                fn(item)
+                latencies.append(time.perf_counter() - t)
+        peak = _peak_memory(lambda xs: [fn(x) for x in xs], (items[:memory_items],))
+        processed = len(items) * repeat
+    else:
+        for _ in range(repeat):
+            t = time.perf_counter()
+            fn(items)
+            latencies.append(time.perf_counter() - t)
+        peak = _peak_memory(fn, (items,))
+        processed = len(items) * repeat
+    total = sum(latencies)
+    return {
+        "items": processed,
+        "seconds": round(total, 4),
+        "throughput": round(processed / total, 2) if total else None,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 4),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 4),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+# ---------------------------
+# Cases
+# ---------------------------
+def _quiet(fn):
+    """Wrap fn so its progress prints do not end up in the benchmark output."""
+    def run(*args, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn(*args, **kwargs)
+    return run
+
+
+def _stream(texts, chunksize, workers=1):
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "tweets.csv")
+        pd.DataFrame({"full_text": texts}).to_csv(src, sep="|", index=False)
+        segregate_tweets.segregate_stream(src, os.path.join(tmp, "safe.csv"), os.path.join(tmp, "violated.csv"),
+                                          chunksize, workers=workers, cache_size=0)
+
+
+def run_cases(n=2000, seed=0, quick=False):
+    """Run every benchmark case; returns {case name: metrics}."""
+    results = {}
+    corpus_n = max(50, n // 4) if quick else n
+    default_matcher = costitu2.get_bias_matcher()
+
+    def record(name, metrics, **params):
+        metrics.update(params)
+        results[name] = metrics
+        print(f"{name:<48} {metrics['throughput'] or 0:>10.1f}/s  p50 {metrics['p50_ms']:>9.3f}ms  "
+              f"p99 {metrics['p99_ms']:>9.3f}ms  peak {metrics['peak_kb']:>9.1f}KB")
+
+    # per-text hot path across hit rates and text lengths
+    for length in TEXT_LENGTHS:
+        for hit_rate in (0.0, 0.2, 0.8):
+            texts = make_corpus(corpus_n, seed, hit_rate=hit_rate, lengths=(length,))
+            record(f"detect_bias_terms[{length},hit={hit_rate}]",
+                   measure(costitu2.detect_bias_terms, texts), length=length, hit_rate=hit_rate)
+
+    texts = make_corpus(corpus_n, seed)
+    record("bias_score", measure(lambda t: costitu2.bias_score(t, default_matcher), texts))
+    record("toxicity_score", measure(costitu2.toxicity_score, texts))
+    record("score_text", measure(lambda t: costitu2.score_text(t, default_matcher), texts))
+    record("classify_text", measure(lambda t: costitu2.classify_text(t, default_matcher), texts))
+    record("score_batch", measure(lambda ts: costitu2.score_batch(ts, default_matcher), texts, per_item=False, repeat=3))
+
+    # seeded candidate generation, so every run decodes the same candidates
+    prompts = [" ".join(t.split()[:3]) for t in make_corpus(max(20, corpus_n // 20), seed + 1, lengths=("short",))]
+    record("constitution_aware_decode", measure(lambda p: costitu2.constitution_aware_decode(p, seed=seed), prompts))
+    record("run_demo", measure(lambda ps: costitu2.run_demo(ps, seed=seed), prompts, per_item=False, repeat=3))
+
+    df = pd.DataFrame({"full_text": texts})
+    record("segregate", measure(lambda d: segregate_tweets.segregate(d, default_matcher), df, per_item=False, repeat=3))
+    record("segregate_stream", measure(_quiet(lambda ts: _stream(ts, max(100, len(ts) // 8))), texts,
+                                       per_item=False))
+
+    # scaling sweeps
+    for scale in ((1, 4) if quick else (1, 4, 16)):
+        kb, l2n = make_kb(scale, seed)
+        t = time.perf_counter()
+        costitu2.get_bias_matcher(kb, l2n)
+        build_ms = round((time.perf_counter() - t) * 1000, 2)
+        sweep_texts = make_corpus(max(50, corpus_n // 4), seed, kb=kb, latin_to_native=l2n)
+        record(f"sweep_kb[x{scale}]",
+               measure(lambda s: costitu2.detect_bias_terms(s, kb, l2n), sweep_texts),
+               kb_terms=sum(len(v) for v in kb.values()) + len(l2n), build_ms=build_ms)
+
+    for size in ((corpus_n, corpus_n * 4) if quick else (corpus_n // 2, corpus_n * 2, corpus_n * 8)):
+        sweep_df = pd.DataFrame({"full_text": make_corpus(size, seed)})
+        record(f"sweep_corpus[{size}]",
+               measure(lambda d: segregate_tweets.segregate(d, default_matcher), sweep_df, per_item=False),
+               corpus_size=size)
+    return results
+
+
+# ---------------------------
+# Import-time budget
+# ---------------------------
+# Milliseconds allowed for a cold `import <module>` (interpreter startup excluded).
+# The scoring core must also import without any of HEAVY_MODULES; they are
+# loaded lazily by the paths that need them (run_demo, save_results, the tweepy client).
+IMPORT_BUDGETS_MS = {
+    "costitu2": 150,
+    "score_cache": 150,
+    "metrics": 50,
+    "twitter_analysis": 200,
+    "twitter_ingest": 250,
+    "twitter_scheduler": 250,
+}
+HEAVY_MODULES = ("pandas", "numpy", "tweepy", "requests")
+_IMPORT_PROBE = (
+    "import json, sys, time\n"
+    "t = time.perf_counter()\n"
+    "import {module}\n"
+    "ms = (time.perf_counter() - t) * 1000\n"
+    "print(json.dumps([ms, [m for m in {heavy!r} if m in sys.modules]]))\n"
+)
+
+
+def measure_import(module, runs=5):
+    """Median cold-import time of `module` in fresh interpreters, and the heavy modules it loaded."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    times, heavy = [], []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                             cwd=here, capture_output=True, text=True, check=True).stdout
+        ms, heavy = json.loads(out.strip().splitlines()[-1])
+        times.append(ms)
+    return {"import_ms": round(_percentile(times, 50), 2), "heavy_modules": heavy}
+
+
+def check_imports(budgets=IMPORT_BUDGETS_MS, runs=5):
+    """Measure every budgeted module; returns (results, violations)."""
+    results, violations = {}, []
+    for module, budget in budgets.items():
+        r = results[module] = dict(measure_import(module, runs), budget_ms=budget)
+        status = "ok"
+        if r["import_ms"] > budget:
+            violations.append(f"import {module}: {r['import_ms']}ms > {budget}ms budget")
+            status = "OVER BUDGET"
+        if r["heavy_modules"]:
+            violations.append(f"import {module} loaded {', '.join(r['heavy_modules'])}")
+            status = "HEAVY IMPORT"
+        print(f"import {module:<40} {r['import_ms']:>9.1f}ms  budget {budget}ms  {status}")
+    return results, violations
+
+
+# ---------------------------
+# Baseline comparison
+# ---------------------------
+COMPARED_METRICS = ("throughput", "p50_ms", "peak_kb")
+
+
+def compare(results, baseline, tolerance=0.25, metrics=COMPARED_METRICS):
+    """List regressions against `baseline`: lower throughput, or higher latency / peak
+    memory, than the baseline by more than `tolerance` (a fraction).
+
+    p99 of sub-millisecond calls is dominated by scheduler noise, so it is reported
+    but only compared when listed in `metrics`.
+    """
+    regressions = []
+    for name, base in baseline.get("results", {}).items():
+        current = results.get(name)
+        if current is None:
+            continue
+        if ("throughput" in metrics and base.get("throughput")
+                and current["throughput"] < base["throughput"] * (1 - tolerance)):
+            regressions.append(f"{name}: throughput {current['throughput']} < {base['throughput']}")
+        for metric in ("p50_ms", "p99_ms", "peak_kb"):
+            if metric in metrics and base.get(metric) and current[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {current[metric]} > {base[metric]}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the detection hot path on synthetic corpora.")
+    parser.add_argument("--n", type=int, default=2000, help="texts per corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quick", action="store_true", help="smaller corpora and sweeps")
+    parser.add_argument("--output", default=None, help="write results JSON here")
+    parser.add_argument("--baseline", default=None, help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown (0.25 = 25%%)")
+    parser.add_argument("--imports-only", action="store_true",
+                        help="only run the import-time budget check")
+    parser.add_argument("--metrics", default=",".join(COMPARED_METRICS),
+                        help="comma-separated metrics checked against the baseline (throughput,p50_ms,p99_ms,peak_kb)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    imports, violations = check_imports()
+    if args.imports_only:
+        return 1 if violations else 0
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "n": args.n,
+            "seed": args.seed,
+            "quick": args.quick,
+            "kb_version": costitu2.kb_version(),
+        },
+        "imports": imports,
+        "results": run_cases(args.n, args.seed, args.quick),
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"✅ Results saved to: {args.output}")
+    regressions = list(violations)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions += compare(report["results"], baseline, args.tolerance, args.metrics.split(","))
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s):")
+        for line in regressions:
+            print(f"   {line}")
+        return 1
+    if args.baseline:
+        print(f"✅ No regressions vs {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
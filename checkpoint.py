@@ -0,0 +1,196 @@
+"""
+checkpoint.py
+
+Byte-range chunking and a progress manifest, so segregating a multi-GB
+pipe-delimited dump survives a crash (`segregate_tweets.segregate_checkpointed`).
+
+- `split_ranges()` takes the memory-mapped input and cuts `[start, end)` byte
+  ranges of about `chunk_bytes` that each hold whole records, without parsing:
+  a cut goes after the first newline where the number of `"` characters since
+  the start of the file is even, i.e. outside any quoted field. That holds for
+  files written with standard CSV quoting (pandas / the csv module double
+  quotes inside quoted fields).
+- Workers parse their range on their own (header bytes + range bytes), score
+  it and write its outputs with `write_part()` (temp file, fsync, rename).
+- `Manifest` is an append-only JSON-lines file: a header line identifying the
+  input, the chunk plan and the scoring options, then one line per finished
+  chunk. A restart with the same header skips those chunks; any other header
+  means the old parts are stale and they are discarded.
+- `merge_parts()` concatenates the parts in chunk order into the final output.
+"""
+
+import json
+import os
+import shutil
+
+CHUNK_BYTES = 32 << 20  # target bytes per chunk
+MANIFEST = "manifest.jsonl"
+
+
+def _record_end(mm, pos, inside=False):
+    """Offset just after the first newline at or after `pos` that ends a record
+    (`inside`: whether `pos` is within a quoted field); len(mm) if there is none."""
+    while True:
+        newline = mm.find(b"\n", pos)
+        if newline == -1:
+            return len(mm)
+        inside ^= bool(mm[pos:newline].count(b'"') & 1)
+        if not inside:
+            return newline + 1
+        pos = newline + 1
+
+
+def header_end(mm):
+    """Offset of the first data record (just after the header line)."""
+    return _record_end(mm, 0)
+
+
+def split_ranges(mm, chunk_bytes=CHUNK_BYTES, start=0):
+    """Record-aligned `(start, end)` byte ranges covering `mm[start:]`.
+
+    `start` must itself be a record boundary (e.g. `header_end(mm)`). An
+    input with no records gives one empty range, so there is still a chunk
+    to carry the header.
+    """
+    size = len(mm)
+    ranges = []
+    while start < size:
+        target = start + chunk_bytes
+        if target >= size:
+            end = size
+        else:
+            inside = bool(mm[start:target].count(b'"') & 1)
+            end = _record_end(mm, target, inside)
+        ranges.append((start, end))
+        start = end
+    return ranges or [(start, start)]
+
+
+def _fsync_dir(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:  # e.g. Windows: directories cannot be opened
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_part(path, data):
+    """Durably write `data` (str, or a pyarrow Table for .parquet paths) to `path`."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if isinstance(data, str):
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+    else:
+        import columnar
+        with columnar.ParquetSink(tmp) as sink:
+            sink.write(data)
+        with open(tmp, "rb") as f:
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def merge_parts(parts, path, out_format="csv"):
+    """Concatenate the part files `parts` (in order) into `path`, replacing it atomically."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if out_format == "parquet":
+        import columnar
+        import pyarrow.parquet as pq
+        with columnar.ParquetSink(tmp) as sink:
+            for part in parts:
+                sink.write(pq.read_table(part))
+    else:
+        with open(tmp, "wb") as out:
+            for part in parts:
+                with open(part, "rb") as f:
+                    shutil.copyfileobj(f, out, 1 << 20)
+    os.replace(tmp, path)
+
+
+def input_key(path, chunk_bytes, **options):
+    """Manifest header for `path`: a restart may reuse parts only if this is unchanged."""
+    stat = os.stat(path)
+    return {"input": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+            "chunk_bytes": chunk_bytes, **options}
+
+
+class Manifest:
+    """Finished chunks of one run, persisted in `<directory>/manifest.jsonl`.
+
+    `done` maps chunk index -> its record (`rows`, `safe`, `violated`, ...).
+    """
+
+    def __init__(self, directory, key):
+        self.directory = directory
+        self.path = os.path.join(directory, MANIFEST)
+        self.done = {}
+        os.makedirs(directory, exist_ok=True)
+        if self._load(key):
+            return
+        # a different input, plan or options: the old parts are stale
+        for name in os.listdir(directory):
+            if name.startswith("part-") or name == MANIFEST:
+                os.remove(os.path.join(directory, name))
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(key) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        _fsync_dir(directory)
+
+    def _load(self, key):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return False
+        try:
+            if not lines or json.loads(lines[0]) != key:
+                return False
+        except ValueError:
+            return False
+        for k, line in enumerate(lines[1:], 1):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # torn last line from a crash mid-append: drop it so new records start on a fresh line
+                self._rewrite(lines[:k])
+                break
+            self.done[entry["chunk"]] = entry
+        return True
+
+    def _rewrite(self, lines):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("".join(line + "\n" for line in lines))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def part_path(self, index, name, out_format="csv"):
+        return os.path.join(self.directory, f"part-{index:05d}.{name}.{out_format}")
+
+    def is_done(self, index, names, out_format="csv"):
+        return index in self.done and all(
+            os.path.exists(self.part_path(index, name, out_format)) for name in names)
+
+    def record(self, entry):
+        """Mark a chunk finished (after its parts are written); survives a crash right after."""
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.done[entry["chunk"]] = entry
+
+    def remove(self):
+        """Delete the manifest and parts once merged (and the directory, if that leaves it empty)."""
+        for name in os.listdir(self.directory):
+            if name.startswith("part-") or name == MANIFEST:
+                os.remove(os.path.join(self.directory, name))
+        try:
+            os.rmdir(self.directory)
+        except OSError:
+            pass
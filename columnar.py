@@ -0,0 +1,143 @@
+"""
+columnar.py
+
+Optional Parquet output for scored results (requires `pyarrow`).
+
+The CSV outputs flatten `bias_matches` to a "term(lang), ..." string and store
+`violated` as text. Here they keep their types:
+
+- `bias_matches`: list<struct<term, lang>>, both fields dictionary-encoded
+- `bias_count`: int32, `toxicity` / `fluency` / `combined`: float64, `violated`: bool,
+  `cluster_id`: int64
+
+`ParquetSink` writes one row group per `write()` call, so streamed chunks never
+need to be held in memory together. Readers get typed columns back:
+
+    import pyarrow.parquet as pq
+    table = pq.read_table("segregated_violated.parquet", columns=["full_text", "bias_matches"])
+"""
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = pq = None
+
+DICT_STRING = None  # dictionary<int32, string>, set once pyarrow is known to be present
+ROW_GROUP_ROWS = 100000  # max rows per row group when one write() gets a large table
+
+
+def require_pyarrow():
+    """Raise a clear ImportError if pyarrow is missing."""
+    global DICT_STRING
+    if pa is None:
+        raise ImportError("Parquet output needs pyarrow: python -m pip install pyarrow")
+    if DICT_STRING is None:
+        DICT_STRING = pa.dictionary(pa.int32(), pa.string())
+
+
+def match_list_type():
+    require_pyarrow()
+    return pa.list_(pa.struct([("term", DICT_STRING), ("lang", DICT_STRING)]))
+
+
+def matches_array(match_sets):
+    """Arrow list<struct<term, lang>> array from an iterable of `(term, lang)` sets (sorted per row)."""
+    require_pyarrow()
+    offsets, terms, langs = [0], [], []
+    for matches in match_sets:
+        for term, lang in sorted(matches or ()):
+            terms.append(term)
+            langs.append(lang)
+        offsets.append(len(terms))
+    items = pa.StructArray.from_arrays(
+        [pa.array(terms, pa.string()).dictionary_encode(), pa.array(langs, pa.string()).dictionary_encode()],
+        names=["term", "lang"],
+    )
+    return pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), items)
+
+
+# Arrow types of the score columns (anything else is inferred from pandas)
+SCORE_TYPES = {
+    "bias_count": "int32",
+    "toxicity": "float64",
+    "fluency": "float64",
+    "combined": "float64",
+    "violated": "bool_",
+    "cluster_id": "int64",
+}
+
+
+def to_table(df, headers=None):
+    """Arrow table from a DataFrame of scored rows.
+
+    `bias_matches` may hold match sets (preferred) or are left as-is if they are
+    already strings. `headers` maps column name -> display header and is stored
+    as field metadata (`b"header"`) instead of renaming the columns.
+    """
+    require_pyarrow()
+    columns, fields = [], []
+    for name in df.columns:
+        values = df[name]
+        if name == "bias_matches" and not values.map(lambda v: isinstance(v, str)).any():
+            array = matches_array(values)
+        elif name in SCORE_TYPES:
+            array = pa.array(values, getattr(pa, SCORE_TYPES[name])())
+        else:
+            array = pa.array(values, from_pandas=True)
+            if pa.types.is_null(array.type):
+                # all-missing in this batch; keep a concrete type so later chunks can match
+                array = array.cast(pa.string())
+        metadata = {b"header": headers[name].encode("utf-8")} if headers and name in headers else None
+        columns.append(array)
+        fields.append(pa.field(str(name), array.type, metadata=metadata))
+    return pa.Table.from_arrays(columns, schema=pa.schema(fields))
+
+
+class ParquetSink:
+    """Streams tables into one Parquet file, one row group per `write()` (large
+    tables are split every `row_group_rows` rows).
+
+    The first table fixes the schema; later tables are cast to it (a ValueError
+    names the columns that cannot be), so chunked writers should not let
+    per-chunk type inference pick the types of passthrough columns.
+    """
+
+    def __init__(self, path, compression="zstd", metadata=None, row_group_rows=ROW_GROUP_ROWS):
+        require_pyarrow()
+        self.path = path
+        self.compression = compression
+        self.row_group_rows = row_group_rows
+        self.metadata = metadata
+        self.rows = 0
+        self._writer = None
+
+    def write(self, table):
+        if self._writer is None:
+            schema = table.schema
+            if self.metadata:
+                schema = schema.with_metadata({k.encode("utf-8"): v.encode("utf-8")
+                                               for k, v in self.metadata.items()})
+            self._writer = pq.ParquetWriter(self.path, schema, compression=self.compression)
+        if table.num_rows:
+            try:
+                table = table.cast(self._writer.schema)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                schema = self._writer.schema
+                clashing = [f.name for f in table.schema if f.name in schema.names and f.type != schema.field(f.name).type]
+                raise ValueError(f"{self.path}: columns {clashing} do not fit the types fixed by the first table "
+                                 f"({e}); read passthrough columns as strings") from e
+            self._writer.write_table(table, row_group_size=self.row_group_rows)
+            self.rows += table.num_rows
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
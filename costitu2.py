@@ -12,11 +12,24 @@ Enhanced End-to-End Demo:
 - Justification for "violated" flag included
 """
 
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
+from bisect import bisect_left
+from collections import Counter
+from itertools import chain
+import copy
+import hashlib
+import json
+import math
+import mmap
+import os
+import pickle
 import random
-import pandas as pd
+import re
+import time
 from datetime import datetime
 
+import metrics
+
 # ---------------------------
 # Heavily-Expanded Knowledge Base
 # ---------------------------
@@ -165,38 +178,804 @@ LATIN_TO_NATIVE = {
 # Bias detection
 # ---------------------------
 FUZZ_THRESHOLD = 80
+# Texts per match_batch step (bounds the candidate (probe, text) pairs per process.cpdist call)
+BATCH_SIZE = 2048
 
-def detect_bias_terms(text, kb=KNOWLEDGE_BASE, latin_to_native=LATIN_TO_NATIVE, threshold=FUZZ_THRESHOLD):
-    text_low = text.lower()
-    matches = set()
-    # Check Latin-key presence and fuzzy match
-    for eng_key, native_map in latin_to_native.items():
-        try:
-            # fuzzy match english key with input
-            if fuzz.partial_ratio(eng_key.lower(), text_low) >= threshold or eng_key.lower() in text_low:
-                # add mapped native terms if they appear in KB
-                for lang, native_term in native_map.items():
-                    for kb_term in kb.get(lang, []):
-                        if fuzz.partial_ratio(native_term, kb_term) >= threshold or native_term in kb_term or kb_term in native_term:
-                            matches.add((kb_term, lang))
-                # also check english KB directly
-                for kb_eng in kb.get("english", []):
-                    if fuzz.partial_ratio(eng_key.lower(), kb_eng) >= threshold or eng_key.lower() in kb_eng:
-                        matches.add((kb_eng, "english"))
-        except Exception:
-            # defensive fallback — skip problematic mapping
+def _overlap_slack(length, threshold):
+    """How many of a string's distinct characters may be absent from the other
+    string while `partial_ratio` can still reach `threshold`.
+
+    partial_ratio aligns the shorter string (length k) with a window of the
+    longer one, scoring 200 * LCS / (k + window) with window >= LCS, so a score
+    of `threshold` needs an LCS of at least k * threshold / (200 - threshold)
+    (2k/3 at the default of 80).
+    """
+    if threshold <= 0:
+        return length
+    threshold = min(threshold, 100)
+    need = math.ceil(length * threshold / (200 - threshold) - 1e-9)
+    return length - need
+
+# q-gram length for the KB inverted index
+QGRAM = 2
+
+def _qgram_needs(length, threshold, q=QGRAM):
+    """Count-filter thresholds for one probe of `length`.
+
+    partial_ratio aligns the probe with a window of its own length anywhere in
+    a (longer) text, and with shorter windows only at the very start or end of
+    the text. Against a window of length w with LCS L, at most q of the
+    probe's q-grams are destroyed per deleted probe character and q - 1 per
+    inserted one. Returns `(full, edge, edge_chars)`: the fewest q-gram
+    positions that must survive for a full-length window, the same for a
+    shorter edge window, and the smallest LCS an edge window needs.
+    `edge` / `edge_chars` are None when no shorter window can reach
+    `threshold`; `full` <= 0 means the probe cannot be filtered by q-grams.
+    """
+    threshold = min(max(threshold, 0), 100)
+    full = edge = edge_chars = None
+    for window in range(1, length + 1):
+        lcs = math.ceil(threshold * (length + window) / 200 - 1e-9)
+        if lcs > window:
             continue
+        shared = (length - q + 1) - q * (length - lcs) - (q - 1) * (window - lcs)
+        if window == length:
+            full = shared
+        else:
+            edge = shared if edge is None else min(edge, shared)
+            edge_chars = lcs if edge_chars is None else min(edge_chars, lcs)
+    return full, edge, edge_chars
+
+def _count_filter(index, keys, need):
+    """Probe ids whose postings under `keys` reach their `need` count."""
+    counts = Counter(chain.from_iterable(index[k] for k in keys if k in index))
+    return [i for i, c in counts.items() if c >= need[i]]
+
+def _qgram_set(text, q=QGRAM):
+    return {text[j:j + q] for j in range(len(text) - q + 1)}
+
+class _QGramIndex:
+    """Inverted q-gram -> probe index with a count filter derived from the threshold.
+
+    Only texts longer than a probe are covered (at equal lengths partial_ratio
+    also aligns the text inside the probe); callers route the other probes
+    separately (see `BiasMatcher._candidates`). Probes that cannot be
+    filtered (`unindexed`) must be scanned some other way.
+    """
+
+    def __init__(self, patterns, threshold, q=QGRAM):
+        self.q = q
+        full_index, char_index = {}, {}
+        self.edge_grams = {}  # probe id -> its q-grams, for probes a shorter edge window can match
+        self.need_full = [0] * len(patterns)
+        self.need_edge = [0] * len(patterns)
+        self.indexed, self.unindexed = [], []
+        # how far from either end of the text an edge window can reach
+        self.edge_span = self.char_span = 0
+        for i, pattern in enumerate(patterns):
+            full, edge, edge_chars = _qgram_needs(len(pattern), threshold, q)
+            if full is None or full <= 0:
+                self.unindexed.append(i)
+                continue
+            self.indexed.append(i)
+            self.need_full[i] = full
+            grams = [pattern[j:j + q] for j in range(len(pattern) - q + 1)]
+            for gram in grams:
+                full_index.setdefault(gram, []).append(i)
+            if edge is None:
+                continue
+            if edge > 0:
+                self.need_edge[i] = edge
+                self.edge_grams[i] = tuple(grams)
+                self.edge_span = max(self.edge_span, len(pattern) - 1)
+            else:
+                # edge windows this short only admit a character count
+                self.need_edge[i] = edge_chars
+                for ch in pattern:
+                    char_index.setdefault(ch, []).append(i)
+                self.char_span = max(self.char_span, len(pattern) - 1)
+        self.full = {k: tuple(v) for k, v in full_index.items()}
+        self.chars = {k: tuple(v) for k, v in char_index.items()}
+
+    def candidates(self, text_low):
+        """Indexed probe ids that may reach the threshold against `text_low`."""
+        n = len(text_low)
+        q = self.q
+        # Full-length windows: a window's q-grams are a subset of the text's,
+        # so counting over the whole text never drops a probe. Counting per
+        # window-sized slice rejects a few more on long texts, but costs more
+        # than the partial_ratio calls it saves.
+        grams = _qgram_set(text_low, q)
+        counts = Counter(chain.from_iterable(self.full[k] for k in grams if k in self.full))
+        need_full, need_edge = self.need_full, self.need_edge
+        found = {i for i, c in counts.items() if c >= need_full[i]}
+        # Shorter windows at the start or end of the text: their q-grams are
+        # the text's too, so only probes whose whole-text count already
+        # reaches the edge need are recounted against the two ends.
+        edge_grams = self.edge_grams
+        edge = [i for i, c in counts.items() if c >= need_edge[i] and i in edge_grams and i not in found]
+        if edge:
+            span = self.edge_span
+            parts = (grams,) if n <= span else (_qgram_set(text_low[:span], q), _qgram_set(text_low[n - span:], q))
+            for i in edge:
+                if any(sum(g in part for g in edge_grams[i]) >= need_edge[i] for part in parts):
+                    found.add(i)
+        if self.chars:
+            span = self.char_span
+            for part in ((text_low,) if n <= span else (text_low[:span], text_low[n - span:])):
+                found.update(_count_filter(self.chars, set(part), need_edge))
+        return found
+
+# Unicode blocks the KB languages are written in; other letters count as "other"
+_SCRIPT_RANGES = (
+    ("devanagari", 0x0900, 0x097F),
+    ("bengali", 0x0980, 0x09FF),
+    ("tamil", 0x0B80, 0x0BFF),
+    ("telugu", 0x0C00, 0x0C7F),
+    ("latin", 0x0041, 0x024F),
+)
+_CHAR_SCRIPTS = {}
+
+def char_script(ch):
+    """Script of one character, or None for script-neutral characters (digits, punctuation, spaces, joiners)."""
+    script = _CHAR_SCRIPTS.get(ch, False)
+    if script is False:
+        code = ord(ch)
+        script = None
+        for name, lo, hi in _SCRIPT_RANGES:
+            if lo <= code <= hi:
+                script = name if (name != "latin" or ch.isalpha()) else None
+                break
+        else:
+            if ch.isalpha():
+                script = "other"
+        _CHAR_SCRIPTS[ch] = script
+    return script
+
+def text_scripts(chars):
+    """Script census: the set of scripts present among `chars` (a string or set of characters)."""
+    scripts = {char_script(ch) for ch in chars}
+    scripts.discard(None)
+    return scripts
+
+def _partition_by_script(probes, indices):
+    """Group probe indices by the scripts they are written in.
+
+    Returns `(scripts, max_len, indices)` triples. A partition may be skipped
+    for a text that contains none of its scripts, provided the text is at
+    least `max_len` long: every probe in it then misses more distinct
+    characters than its overlap slack allows. Probes for which that does not
+    hold (mostly script-neutral characters) go in the partition with an
+    empty script set, which is always scanned.
+    """
+    groups = {}
+    for i in indices:
+        pattern, chars, slack = probes[i]
+        scripts = frozenset(text_scripts(chars))
+        script_chars = sum(1 for ch in chars if char_script(ch) is not None)
+        if script_chars <= slack:
+            scripts = frozenset()
+        groups.setdefault(scripts, []).append(i)
+    return [
+        (scripts, max(len(probes[i][0]) for i in indices), indices)
+        for scripts, indices in groups.items()
+    ]
+
+class _AhoCorasick:
+    """Multi-pattern exact matcher: reports every pattern occurring in a text in one pass."""
+
+    def __init__(self, patterns):
+        # patterns: iterable of (string, value); a string may carry several values
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]
+        for pattern, value in patterns:
+            if not pattern:
+                continue
+            node = 0
+            for ch in pattern:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = self.goto[node][ch] = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(())
+                node = nxt
+            self.out[node] = self.out[node] + (value,)
+
+        # breadth-first failure links; outputs inherit their failure node's outputs
+        queue = list(self.goto[0].values())
+        for node in queue:
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                f = self.goto[f].get(ch, 0)
+                self.fail[nxt] = f if f != nxt else 0
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def find_all(self, text):
+        """Return the set of values whose pattern occurs in `text`."""
+        goto, fail, out = self.goto, self.fail, self.out
+        found = set()
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+def kb_version(kb=KNOWLEDGE_BASE, latin_to_native=LATIN_TO_NATIVE, threshold=FUZZ_THRESHOLD):
+    """Content hash of the KB, the Latin mapping and the threshold (changes whenever any of them does)."""
+    payload = json.dumps([kb, latin_to_native, threshold], sort_keys=True, ensure_ascii=False, default=sorted)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+def _key_covers(key_low, native_map, term, lang, threshold):
+    """True if Latin key `key_low` (with its native spellings) expands to KB entry `(term, lang)`."""
+    try:
+        native_term = native_map.get(lang)
+        if native_term is not None and (fuzz.partial_ratio(native_term, term) >= threshold
+                                        or native_term in term or term in native_term):
+            return True
+        return lang == "english" and (fuzz.partial_ratio(key_low, term) >= threshold or key_low in term)
+    except Exception:
+        return False
+
+def _key_expansion(eng_key, native_map, kb, threshold):
+    """Frozenset of `(term, lang)` KB entries a Latin key expands to, or None if it cannot be expanded."""
+    expanded = set()
+    try:
+        key_low = eng_key.lower()
+        # add mapped native terms if they appear in KB
+        for lang, native_term in native_map.items():
+            for kb_term in kb.get(lang, []):
+                if fuzz.partial_ratio(native_term, kb_term) >= threshold or native_term in kb_term or kb_term in native_term:
+                    expanded.add((kb_term, lang))
+        # also check english KB directly
+        for kb_eng in kb.get("english", []):
+            if fuzz.partial_ratio(key_low, kb_eng) >= threshold or key_low in kb_eng:
+                expanded.add((kb_eng, "english"))
+    except Exception:
+        # defensive fallback — keep whatever was expanded before the failure
+        if not expanded:
+            return None
+    return frozenset(expanded)
+
+def kb_diff(old_kb, old_latin_to_native, kb, latin_to_native):
+    """Terms and Latin keys added or removed between two KBs.
+
+    Returns a dict of `added_terms` / `removed_terms` (`(term, lang)` lists) and
+    `added_keys` / `removed_keys`; a key whose mapping changed is in both.
+    """
+    added_terms, removed_terms = [], []
+    for lang in sorted(set(old_kb) | set(kb)):
+        old, new = set(old_kb.get(lang, ())), set(kb.get(lang, ()))
+        added_terms += [(term, lang) for term in sorted(new - old, key=str)]
+        removed_terms += [(term, lang) for term in sorted(old - new, key=str)]
+    return {
+        "added_terms": added_terms,
+        "removed_terms": removed_terms,
+        "added_keys": [k for k, v in latin_to_native.items() if old_latin_to_native.get(k) != v],
+        "removed_keys": [k for k, v in old_latin_to_native.items() if latin_to_native.get(k) != v],
+    }
+
+# Probe slot of a retired (removed) KB entry: an empty pattern with negative
+# slack fails the character-overlap bound, so it never reaches partial_ratio.
+_RETIRED_PROBE = ("", frozenset(), -1)
+
+class _ProbeIndex:
+    """Exact-hit automaton and fuzzy-candidate routing for a set of probes.
 
-    # Direct multilingual KB matches against text
-    for lang, terms in kb.items():
-        for term in terms:
+    `ids` are the matcher-wide probe ids covered (None = all of `probes`, in
+    order). A matcher has one over its base probes and, after `updated()`,
+    a second small one over the probes added since.
+    """
+
+    def __init__(self, probes, threshold, ids=None):
+        self.ids = ids
+        if ids is None:
+            ids = range(len(probes))
+        patterns = [probes[i][0] for i in ids]
+        self.scanner = _AhoCorasick((p, i) for i, p in zip(ids, patterns))
+        self.qgrams = _QGramIndex(patterns, threshold)
+        self.partitions = _partition_by_script(probes, [ids[j] for j in self.qgrams.unindexed])
+        # The count filter assumes the text is longer than the probe; indexed
+        # probes at least as long as the text are routed by length instead.
+        by_length = sorted((ids[j] for j in self.qgrams.indexed), key=lambda i: len(probes[i][0]))
+        self.indexed_lengths = [len(probes[i][0]) for i in by_length]
+        self.indexed_by_length = by_length
+
+    def route(self, text_low, scripts):
+        """Probe ids that may reach the threshold against `text_low` (whose scripts are `scripts`)."""
+        n = len(text_low)
+
+        # q-gram count filter
+        routed = self.qgrams.candidates(text_low)
+        if self.ids is not None:
+            ids = self.ids
+            routed = {ids[j] for j in routed}
+
+        # indexed probes at least as long as the text
+        routed.update(self.indexed_by_length[bisect_left(self.indexed_lengths, n):])
+
+        # unindexed (short) probes by script census
+        for part_scripts, max_len, indices in self.partitions:
+            if n < max_len or not part_scripts or part_scripts & scripts:
+                routed.update(indices)
+        return routed
+
+class BiasMatcher:
+    """Precompiled knowledge base for repeated `detect_bias_terms` lookups.
+
+    Which KB terms a Latin key expands to depends only on the KB, the
+    mapping and the threshold, so that table is built once here and a text
+    lookup only runs the comparisons that involve the text itself.
+
+    Matchers are never modified after construction: `updated()` returns a new
+    matcher for an edited KB (applying only the difference) and `compacted()`
+    a fully rebuilt one, so a reference can be swapped while others still use
+    the old matcher.
+    """
+
+    def __init__(self, kb=KNOWLEDGE_BASE, latin_to_native=LATIN_TO_NATIVE, threshold=FUZZ_THRESHOLD):
+        build_start = time.perf_counter()
+        # keep the source dicts alive so `get_bias_matcher` ids stay unique
+        self.kb = kb
+        self.latin_to_native = latin_to_native
+        self.threshold = threshold
+        self.version = kb_version(kb, latin_to_native, threshold)
+
+        # Probe i is a lowercased Latin key (in mapping order) or KB term.
+        # `_probe_matches[i]` is what a hit on it contributes: the key's
+        # expansion, or the term itself. `_probe_labels[i]` is its
+        # (term, language) metric label; Latin keys are labelled "latin".
+        patterns, self._probe_matches, self._probe_labels = [], [], []
+        self._key_probes = {}   # Latin key -> probe id
+        self._term_probes = {}  # (term, lang) -> probe ids (a term may be listed twice)
+        for eng_key, native_map in latin_to_native.items():
+            expansion = _key_expansion(eng_key, native_map, kb, threshold)
+            if expansion is None:
+                continue
+            self._key_probes[eng_key] = len(patterns)
+            patterns.append(eng_key.lower())
+            self._probe_matches.append(expansion)
+            self._probe_labels.append((eng_key.lower(), "latin"))
+        n_keys = len(patterns)
+        for lang, terms in kb.items():
+            for term in terms:
+                try:
+                    term_low = term.lower()
+                except Exception:
+                    continue
+                self._term_probes.setdefault((term, lang), []).append(len(patterns))
+                patterns.append(term_low)
+                self._probe_matches.append(frozenset([(term, lang)]))
+                self._probe_labels.append((term, lang))
+
+        # Exact (substring) hits come from one automaton pass. Fuzzy candidates
+        # come from the q-gram index (count filter), or, for probes too short
+        # to filter that way, from script routing; every candidate must also
+        # pass the character-overlap bound before partial_ratio runs.
+        self._probes = [(p, frozenset(p), _overlap_slack(len(p), threshold)) for p in patterns]
+        self._index = _ProbeIndex(self._probes, threshold)
+        # probes added by `updated()` since the last full build, and how many were retired
+        self._overlay = None
+        self._overlay_ids = []
+        self.retired = 0
+        # rapidfuzz only accepts cutoffs in 0-100; scores are still compared with `threshold`
+        self._cutoff = min(max(threshold, 0), 100)
+        # Verification order for early-exit classification: Latin keys with
+        # the largest expansions first, since one hit settles the most.
+        key_order = sorted(range(n_keys), key=lambda i: -len(self._probe_matches[i]))
+        self._priority = [0] * len(patterns)
+        for rank, i in enumerate(key_order + list(range(n_keys, len(patterns)))):
+            self._priority[i] = rank
+        if metrics.ENABLED:
+            metrics.observe("stage_seconds", time.perf_counter() - build_start, stage="kb_build")
+
+    @property
+    def max_probe_length(self):
+        """Length of the longest live probe: the widest text window a match can depend on."""
+        return max((len(p) for p, _, _ in self._probes), default=0)
+
+    @property
+    def patterns(self):
+        """Lowercased probe patterns by probe id ("" for retired probes)."""
+        return [p for p, _, _ in self._probes]
+
+    @property
+    def overlay_size(self):
+        """Live probes added by `updated()` since the last full build."""
+        return len(self._overlay_ids)
+
+    def updated(self, kb, latin_to_native, delta=None):
+        """A matcher for `kb` / `latin_to_native`, derived from this one by applying the difference.
+
+        Removed terms and keys are retired, Latin-key expansions are patched for
+        the added and removed terms, and added probes go into a small overlay
+        index, so the cost follows the size of the change rather than the KB.
+        `delta` is `kb_diff(self.kb, self.latin_to_native, kb, latin_to_native)`
+        if already computed. `self` is not modified.
+        """
+        start = time.perf_counter()
+        if delta is None:
+            delta = kb_diff(self.kb, self.latin_to_native, kb, latin_to_native)
+        threshold = self.threshold
+        new = copy.copy(self)
+        new.kb = kb
+        new.latin_to_native = latin_to_native
+        new.version = kb_version(kb, latin_to_native, threshold)
+        probes = new._probes = list(self._probes)
+        matches = new._probe_matches = list(self._probe_matches)
+        labels = new._probe_labels = list(self._probe_labels)
+        priority = new._priority = list(self._priority)
+        key_probes = new._key_probes = dict(self._key_probes)
+        term_probes = new._term_probes = dict(self._term_probes)
+        overlay_ids = list(self._overlay_ids)
+
+        def retire(i):
+            probes[i] = _RETIRED_PROBE
+            matches[i] = frozenset()
+            new.retired += 1
+
+        def add_probe(pattern, probe_matches, label):
+            i = len(probes)
+            probes.append((pattern, frozenset(pattern), _overlap_slack(len(pattern), threshold)))
+            matches.append(probe_matches)
+            labels.append(label)
+            priority.append(i)
+            overlay_ids.append(i)
+            return i
+
+        for eng_key in delta["removed_keys"]:
+            i = key_probes.pop(eng_key, None)
+            if i is not None:
+                retire(i)
+        for entry in delta["removed_terms"]:
+            for i in term_probes.pop(entry, ()):
+                retire(i)
+
+        removed = frozenset(delta["removed_terms"])
+        added = delta["added_terms"]
+        if removed or added:
+            for eng_key, i in key_probes.items():
+                expansion = matches[i]
+                patched = expansion - removed if not expansion.isdisjoint(removed) else expansion
+                native_map = latin_to_native[eng_key]
+                extra = [(term, lang) for term, lang in added
+                         if _key_covers(probes[i][0], native_map, term, lang, threshold)]
+                if extra:
+                    patched = patched.union(extra)
+                matches[i] = patched
+
+        for term, lang in added:
             try:
-                if fuzz.partial_ratio(term.lower(), text_low) >= threshold or term.lower() in text_low:
-                    matches.add((term, lang))
+                term_low = term.lower()
             except Exception:
                 continue
+            term_probes[(term, lang)] = [add_probe(term_low, frozenset([(term, lang)]), (term, lang))]
+        for eng_key in delta["added_keys"]:
+            expansion = _key_expansion(eng_key, latin_to_native[eng_key], kb, threshold)
+            if expansion is not None:
+                key_probes[eng_key] = add_probe(eng_key.lower(), expansion, (eng_key.lower(), "latin"))
+
+        new._overlay_ids = [i for i in overlay_ids if probes[i] is not _RETIRED_PROBE]
+        new._overlay = _ProbeIndex(probes, threshold, new._overlay_ids) if new._overlay_ids else None
+        if metrics.ENABLED:
+            metrics.observe("stage_seconds", time.perf_counter() - start, stage="kb_update")
+        return new
+
+    def compacted(self):
+        """A fully rebuilt matcher for the same KB (folds in the overlay and drops retired probes)."""
+        return BiasMatcher(self.kb, self.latin_to_native, self.threshold)
+
+    def _exact_hits(self, text_low):
+        hits = self._index.scanner.find_all(text_low)
+        if self._overlay is not None:
+            hits |= self._overlay.scanner.find_all(text_low)
+        return hits
+
+    def _candidates(self, text_low):
+        """Return `(exact_hits, candidates)`: probe indices found verbatim in
+        `text_low`, and the other probe indices that may still reach the
+        threshold and need a partial_ratio check."""
+        hits = self._exact_hits(text_low)
+        return hits, self._fuzzy_candidates(text_low, hits)
+
+    def _fuzzy_candidates(self, text_low, hits):
+        """Probe indices not in `hits` that may still reach the threshold."""
+        text_chars = set(text_low)
+        n = len(text_low)
+        scripts = text_scripts(text_chars)
+        routed = self._index.route(text_low, scripts)
+        if self._overlay is not None:
+            routed |= self._overlay.route(text_low, scripts)
+
+        routed -= hits
+        probes = self._probes
+        n_slack = _overlap_slack(n, self.threshold)
+        candidates = []
+        for i in routed:
+            pattern, chars, slack = probes[i]
+            # cheap character-overlap bound on the shorter of the two strings
+            if len(pattern) <= n:
+                if len(chars - text_chars) > slack:
+                    continue
+            elif len(text_chars - chars) > n_slack:
+                continue
+            candidates.append(i)
+        return candidates
+
+    def _probe_hits(self, text_low):
+        """Indices of probes that hit `text_low` (substring or partial_ratio >= threshold)."""
+        if metrics.ENABLED:
+            return self._probe_hits_instrumented(text_low)
+        hits, candidates = self._candidates(text_low)
+        threshold = self.threshold
+        probes = self._probes
+        for i in candidates:
+            if fuzz.partial_ratio(probes[i][0], text_low, score_cutoff=self._cutoff) >= threshold:
+                hits.add(i)
+        return hits
+
+    def _probe_hits_instrumented(self, text_low):
+        """`_probe_hits` plus stage timings and partial_ratio counters (metrics enabled).
+
+        In profile mode every partial_ratio call is also timed per KB term.
+        """
+        clock = time.perf_counter
+        start = clock()
+        hits, candidates = self._candidates(text_low)
+        filtered = clock()
+        metrics.inc("exact_hits_total", len(hits))
+        threshold = self.threshold
+        probes = self._probes
+        labels = self._probe_labels
+        profile = metrics.PROFILE
+        for i in candidates:
+            if profile:
+                t = clock()
+                score = fuzz.partial_ratio(probes[i][0], text_low, score_cutoff=self._cutoff)
+                term, lang = labels[i]
+                metrics.observe("kb_term_seconds", clock() - t, term=term, lang=lang)
+            else:
+                score = fuzz.partial_ratio(probes[i][0], text_low, score_cutoff=self._cutoff)
+            if score >= threshold:
+                hits.add(i)
+        metrics.observe("stage_seconds", filtered - start, stage="bias_candidates")
+        metrics.observe("stage_seconds", clock() - filtered, stage="bias_fuzzy")
+        self._count_calls(candidates)
+        return hits
+
+    def _count_calls(self, probe_indices):
+        """Record partial_ratio calls per probe language."""
+        calls = Counter(self._probe_labels[i][1] for i in probe_indices)
+        for lang, count in calls.items():
+            metrics.inc("partial_ratio_calls_total", count, lang=lang)
+
+    def _matches_from_hits(self, hits):
+        if metrics.ENABLED:
+            start = time.perf_counter()
+            matches = self._expand_hits(hits)
+            metrics.observe("stage_seconds", time.perf_counter() - start, stage="latin_expansion")
+            for term, lang in matches:
+                metrics.inc("bias_matches_total", term=term, lang=lang)
+            return matches
+        return self._expand_hits(hits)
+
+    def _expand_hits(self, hits):
+        probe_matches = self._probe_matches
+        matches = set()
+        for i in hits:
+            matches |= probe_matches[i]
+        return matches
 
-    return matches
+    def exceeds(self, text_low, limit):
+        """True if `text_low` (already lowercased) has more than `limit` matches.
+
+        Stops as soon as that is certain: exact hits are counted first, then
+        fuzzy candidates are verified in priority order.
+        """
+        hits = self._exact_hits(text_low)
+        matches = self._expand_hits(hits)
+        if len(matches) > limit:
+            return True
+        candidates = self._fuzzy_candidates(text_low, hits)
+        threshold = self.threshold
+        probes = self._probes
+        probe_matches = self._probe_matches
+        ordered = sorted(candidates, key=self._priority.__getitem__)
+        verified = 0
+        try:
+            for verified, i in enumerate(ordered, 1):
+                if fuzz.partial_ratio(probes[i][0], text_low, score_cutoff=self._cutoff) < threshold:
+                    continue
+                matches |= probe_matches[i]
+                if len(matches) > limit:
+                    return True
+            return False
+        finally:
+            if metrics.ENABLED:
+                self._count_calls(ordered[:verified])
+
+    def probe_hits(self, probe_ids, texts_low, workers=-1):
+        """Boolean array: does probe `probe_ids[k]` hit `texts_low[k]`
+        (partial_ratio >= threshold)? Scored in C with `process.cpdist`."""
+        scores = process.cpdist([self._probes[i][0] for i in probe_ids], texts_low,
+                                scorer=fuzz.partial_ratio, score_cutoff=self._cutoff, workers=workers)
+        return scores >= self.threshold
+
+    def matches_of(self, probe_ids):
+        """The `(term, language)` matches that hits on `probe_ids` contribute."""
+        return self._expand_hits(probe_ids)
+
+    def match(self, text):
+        """Return the set of `(term, language)` KB matches for `text`."""
+        return self._matches_from_hits(self._probe_hits(text.lower()))
+
+    def match_batch(self, texts, workers=-1, batch_size=BATCH_SIZE):
+        """Return one match set per text, verifying the whole batch's candidates at once.
+
+        Candidate (probe, text) pairs from every text are scored in C with
+        `process.cpdist` across `workers` threads (-1 = all cores),
+        `batch_size` texts at a time.
+        """
+        threshold = self.threshold
+        probes = self._probes
+        results = []
+        for start in range(0, len(texts), batch_size):
+            with metrics.stage("bias_candidates"):
+                lows = [t.lower() for t in texts[start:start + batch_size]]
+                hits = []
+                pair_probes, pair_texts, pair_cols = [], [], []
+                for col, low in enumerate(lows):
+                    exact, candidates = self._candidates(low)
+                    hits.append(exact)
+                    for i in candidates:
+                        pair_probes.append(i)
+                        pair_texts.append(low)
+                        pair_cols.append(col)
+            if pair_probes and metrics.PROFILE:
+                # profile mode: score pair by pair so each KB term's time can be attributed
+                self._verify_pairs_profiled(hits, pair_probes, pair_texts, pair_cols)
+            elif pair_probes:
+                with metrics.stage("bias_fuzzy"):
+                    scores = process.cpdist([probes[i][0] for i in pair_probes], pair_texts,
+                                            scorer=fuzz.partial_ratio, score_cutoff=self._cutoff, workers=workers)
+                    for k in (scores >= threshold).nonzero()[0]:
+                        hits[pair_cols[k]].add(pair_probes[k])
+            if metrics.ENABLED:
+                metrics.inc("exact_hits_total", sum(map(len, hits)))
+                self._count_calls(pair_probes)
+            results.extend(self._matches_from_hits(h) for h in hits)
+        return results
+
+    def _verify_pairs_profiled(self, hits, pair_probes, pair_texts, pair_cols):
+        clock = time.perf_counter
+        start = clock()
+        for i, low, col in zip(pair_probes, pair_texts, pair_cols):
+            t = clock()
+            score = fuzz.partial_ratio(self._probes[i][0], low, score_cutoff=self._cutoff)
+            term, lang = self._probe_labels[i]
+            metrics.observe("kb_term_seconds", clock() - t, term=term, lang=lang)
+            if score >= self.threshold:
+                hits[col].add(i)
+        metrics.observe("stage_seconds", clock() - start, stage="bias_fuzzy")
+
+# ---------------------------
+# Compiled KB artifact
+# ---------------------------
+# A BiasMatcher's compiled state (expansion table, automaton, q-gram index,
+# script partitions) saved to one file, so processes load it instead of
+# rebuilding. The header records a content hash of the payload and a build
+# key (artifact format, kb_version and a fingerprint of this source file);
+# a mismatch on either means the artifact is stale and is ignored.
+# Artifacts are pickles: only load files you built yourself.
+ARTIFACT_FORMAT = 2
+KB_ARTIFACT_PATH = os.getenv(
+    "COSTITU2_KB_ARTIFACT", os.path.join(os.path.dirname(os.path.abspath(__file__)), "kb_artifact.bin"))
+_ARTIFACT_MAGIC = b"COSTITU2-KB\n"
+_SOURCE_FINGERPRINT = None
+
+def _source_fingerprint():
+    global _SOURCE_FINGERPRINT
+    if _SOURCE_FINGERPRINT is None:
+        with open(os.path.abspath(__file__), "rb") as f:
+            _SOURCE_FINGERPRINT = hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+    return _SOURCE_FINGERPRINT
+
+def artifact_key(kb=KNOWLEDGE_BASE, latin_to_native=LATIN_TO_NATIVE, threshold=FUZZ_THRESHOLD):
+    """Build key an artifact must carry to be valid for this KB, threshold and code."""
+    return f"{ARTIFACT_FORMAT}:{kb_version(kb, latin_to_native, threshold)}:{_source_fingerprint()}"
+
+def save_matcher_artifact(matcher, path=KB_ARTIFACT_PATH):
+    """Write `matcher`'s compiled state to `path` (atomically). Returns the header dict."""
+    state = {k: v for k, v in vars(matcher).items() if k not in ("kb", "latin_to_native")}
+    payload = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+    header = {
+        "format": ARTIFACT_FORMAT,
+        "key": artifact_key(matcher.kb, matcher.latin_to_native, matcher.threshold),
+        "kb_version": matcher.version,
+        "sha256": hashlib.sha256(payload).hexdigest(),
+        "size": len(payload),
+        "probes": len(matcher._probes),
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_ARTIFACT_MAGIC)
+        f.write(json.dumps(header).encode("utf-8") + b"\n")
+        f.write(payload)
+    os.replace(tmp, path)
+    return header
+
+def read_artifact_header(path=KB_ARTIFACT_PATH):
+    """Header dict of the artifact at `path`, or None if it is missing or not an artifact."""
+    try:
+        with open(path, "rb") as f:
+            if f.readline() != _ARTIFACT_MAGIC:
+                return None
+            return json.loads(f.readline())
+    except (OSError, ValueError):
+        return None
+
+def load_matcher_artifact(path=KB_ARTIFACT_PATH, kb=KNOWLEDGE_BASE, latin_to_native=LATIN_TO_NATIVE,
+                          threshold=FUZZ_THRESHOLD):
+    """BiasMatcher from the artifact at `path`, or None if it is missing, corrupt or stale.
+
+    The file is memory-mapped, so concurrent workers read the payload from the
+    shared page cache rather than private copies; each still unpickles its own
+    Python objects (milliseconds, versus a build that grows quadratically with
+    the KB).
+    """
+    start = time.perf_counter()
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm.readline() != _ARTIFACT_MAGIC:
+                return None
+            header = json.loads(mm.readline())
+            if header.get("key") != artifact_key(kb, latin_to_native, threshold):
+                return None
+            offset = mm.tell()
+            with memoryview(mm)[offset:offset + header["size"]] as payload:
+                if hashlib.sha256(payload).hexdigest() != header["sha256"]:
+                    return None
+                state = pickle.loads(payload)
+    except (OSError, ValueError, KeyError, pickle.UnpicklingError):
+        return None
+    matcher = BiasMatcher.__new__(BiasMatcher)
+    vars(matcher).update(state)
+    matcher.kb = kb
+    matcher.latin_to_native = latin_to_native
+    if metrics.ENABLED:
+        metrics.observe("stage_seconds", time.perf_counter() - start, stage="kb_load")
+    return matcher
+
+_MATCHERS = {}
+
+def get_bias_matcher(kb=KNOWLEDGE_BASE, latin_to_native=LATIN_TO_NATIVE, threshold=FUZZ_THRESHOLD):
+    """Return a cached `BiasMatcher` for the given KB objects.
+
+    Matchers are cached by object identity, so edit the KB dicts before the
+    first lookup (or build a fresh `BiasMatcher`) rather than mutating them
+    in place afterwards. The first lookup loads `KB_ARTIFACT_PATH` if it was
+    built for this KB and threshold, and builds from source otherwise.
+    """
+    key = (id(kb), id(latin_to_native), threshold)
+    matcher = _MATCHERS.get(key)
+    if matcher is None:
+        if os.path.exists(KB_ARTIFACT_PATH):
+            matcher = load_matcher_artifact(KB_ARTIFACT_PATH, kb, latin_to_native, threshold)
+        if matcher is None:
+            matcher = BiasMatcher(kb, latin_to_native, threshold)
+        _MATCHERS[key] = matcher
+    return matcher
+
+def detect_bias_terms(text, kb=KNOWLEDGE_BASE, latin_to_native=LATIN_TO_NATIVE, threshold=FUZZ_THRESHOLD):
+    return get_bias_matcher(kb, latin_to_native, threshold).match(text)
 
 # ---------------------------
 # Scoring heuristics
@@ -206,20 +985,43 @@ TOXIC_KEYWORDS = {
     "stupid", "inferior", "dirty", "backward", "lazy", "illiterate", "unclean", "hate", "fight", "terror", "villain"
 }
 
-def bias_score(text):
-    matches = detect_bias_terms(text)
-    return len(matches), matches
+def format_matches(matches):
+    """Render a match set as "term(lang), ..." in sorted order so output is stable across processes."""
+    return ", ".join([f"{m[0]}({m[1]})" for m in sorted(matches)]) if matches else ""
 
-def toxicity_score(text):
-    t = sum(1 for kw in TOXIC_KEYWORDS if kw in text.lower())
+_TOXIC_PATTERN = (None, None, None)
+
+def _toxic_pattern():
+    """Compiled keyword pattern for TOXIC_KEYWORDS, rebuilt if the set has been edited.
+
+    The lookahead reports, at every position, the longest keyword starting
+    there; any shorter keyword starting at the same position is a prefix of
+    it, so each reported keyword also implies every keyword it contains.
+    """
+    global _TOXIC_PATTERN
+    keywords = frozenset(TOXIC_KEYWORDS)
+    if _TOXIC_PATTERN[0] != keywords:
+        words = sorted((kw for kw in keywords if kw), key=len, reverse=True)
+        pattern = re.compile("(?=(" + "|".join(map(re.escape, words)) + "))") if words else None
+        implied = {kw: frozenset(other for other in words if other in kw) for kw in words}
+        _TOXIC_PATTERN = (keywords, pattern, implied)
+    return _TOXIC_PATTERN[1], _TOXIC_PATTERN[2]
+
+def _toxicity_of(text_low):
+    # distinct keywords occurring anywhere in the text (the empty keyword always does)
+    pattern, implied = _toxic_pattern()
+    found = set()
+    if pattern is not None:
+        for m in pattern.finditer(text_low):
+            found |= implied[m.group(1)]
+    t = len(found) + ("" in TOXIC_KEYWORDS)
     return min(1.0, t / 3.0)
 
-def fluency_score(text):
-    words = text.strip().split()
-    if not words:
+def _fluency_of(n_words):
+    if not n_words:
         return 0.0
     # approximate "fluency" by word count (demo heuristic)
-    avg_len = len(words)
+    avg_len = n_words
     if 8 <= avg_len <= 20:
         return 1.0
     if avg_len < 8:
@@ -227,10 +1029,83 @@ def fluency_score(text):
     else:
         return max(0.0, 1.0 - (avg_len - 20) * 0.02)
 
+def score_text(text, matcher=None):
+    """Bias, toxicity and fluency of one text from a single normalization pass.
+
+    Returns a dict with `bias_count`, `bias_matches`, `toxicity` and
+    `fluency`, equal to calling `bias_score`, `toxicity_score` and
+    `fluency_score` separately.
+    """
+    text_low = text.lower()
+    matcher = matcher or get_bias_matcher()
+    matches = matcher._matches_from_hits(matcher._probe_hits(text_low))
+    if metrics.ENABLED:
+        with metrics.stage("toxicity"):
+            toxicity = _toxicity_of(text_low)
+    else:
+        toxicity = _toxicity_of(text_low)
+    return {
+        "bias_count": len(matches),
+        "bias_matches": matches,
+        "toxicity": toxicity,
+        # lowercasing never adds or removes whitespace, so the word count is the same
+        "fluency": _fluency_of(len(text_low.split())),
+    }
+
+def classify_text(text, matcher=None, bias_threshold=1, toxicity_threshold=0.2):
+    """Classify-only mode: True if the text violates the thresholds.
+
+    Same verdict as `bias_count > bias_threshold or toxicity > toxicity_threshold`
+    from `score_text`, but stops as soon as it is decided: the toxic keyword
+    check runs first, then bias matching stops at the first match past
+    `bias_threshold`. Use `score_text` when `bias_matches` are needed.
+    """
+    text_low = text.lower()
+    if _toxicity_of(text_low) > toxicity_threshold:
+        return True
+    return (matcher or get_bias_matcher()).exceeds(text_low, bias_threshold)
+
+def bias_score(text, matcher=None):
+    matches = (matcher or get_bias_matcher()).match(text)
+    return len(matches), matches
+
+def toxicity_score(text):
+    return _toxicity_of(text.lower())
+
+def fluency_score(text):
+    return _fluency_of(len(text.split()))
+
+def score_batch(texts, matcher=None, workers=-1):
+    """Score many texts at once.
+
+    Returns a dict of equal-length columns: `bias_count`, `bias_matches`
+    (sets of `(term, language)`), `toxicity` and `fluency`. Bias matching
+    runs through `BiasMatcher.match_batch`, which spreads the fuzzy
+    comparisons over `workers` cores.
+    """
+    texts = [t if isinstance(t, str) else str(t) for t in texts]
+    matches = (matcher or get_bias_matcher()).match_batch(texts, workers=workers)
+    lows = [t.lower() for t in texts]
+    with metrics.stage("toxicity"):
+        toxicity = [_toxicity_of(low) for low in lows]
+    with metrics.stage("fluency"):
+        fluency = [_fluency_of(len(low.split())) for low in lows]
+    return {
+        "bias_count": [len(m) for m in matches],
+        "bias_matches": matches,
+        "toxicity": toxicity,
+        "fluency": fluency,
+    }
+
 # ---------------------------
 # Simulated generator
 # ---------------------------
-def simulated_generator(prompt, n_candidates=4):
+# Generators are batch callables: generator(prompts, n_candidates, seeds) ->
+# one list of candidate strings per prompt. `seeds` is one int per prompt (or
+# None for unseeded sampling); a prompt's candidates must depend only on the
+# prompt and its seed, not on how prompts are batched. Use a module-level
+# function when decoding with worker processes.
+def simulated_generator(prompt, n_candidates=4, rng=None):
     templates = [
         f"The {prompt} are hardworking and intelligent.",
         f"The {prompt} are lazy and stupid.",
@@ -241,7 +1116,18 @@ def simulated_generator(prompt, n_candidates=4):
         f"Some {prompt} people are influential in local politics."
     ]
     # return random varied samples up to n_candidates
-    return random.sample(templates, k=min(n_candidates, len(templates)))
+    return (rng or random).sample(templates, k=min(n_candidates, len(templates)))
+
+def simulated_batch_generator(prompts, n_candidates=4, seeds=None):
+    """Batch generator over `simulated_generator`, one seeded RNG per prompt."""
+    if seeds is None:
+        return [simulated_generator(p, n_candidates) for p in prompts]
+    return [simulated_generator(p, n_candidates, random.Random(seed)) for p, seed in zip(prompts, seeds)]
+
+def prompt_seeds(seed, start, count):
+    """Seeds for prompts `start` .. `start + count - 1` of a run seeded with `seed`."""
+    return [int.from_bytes(hashlib.blake2b(f"{seed}:{i}".encode(), digest_size=8).digest(), "big")
+            for i in range(start, start + count)]
 
 # ---------------------------
 # Neutralized message (multilingual)
@@ -257,62 +1143,146 @@ def neutralize_response(prompt, kb_matches=None):
 # ---------------------------
 # Constitution-aware decode
 # ---------------------------
+# Per-candidate output columns of decode_batch, in run_demo's column order
+DECODE_COLUMNS = ("prompt", "candidate", "bias_count", "bias_matches", "toxicity", "fluency",
+                  "combined", "final_selected", "violated", "justification")
+# Prompts per decode_batch call when decoding many prompts
+DECODE_CHUNK = 256
+
+def decode_batch(prompts, n_candidates=4, bias_threshold=1, toxicity_threshold=0.2, fluency_weight=1.0,
+                 generator=simulated_batch_generator, seed=None, start=0, matcher=None, workers=-1):
+    """Constitution-aware decode for a batch of prompts, returned as columns.
+
+    Candidates for every prompt come from one `generator` call and are scored
+    in one `score_batch` pass (each distinct candidate once). Returns a dict of DECODE_COLUMNS lists with one
+    entry per candidate (`bias_matches` as sets). With `seed`, the prompt at
+    position `k` is generated from `prompt_seeds(seed, start + k, 1)`, so a
+    chunk decoded with its `start` offset matches the same rows of a serial run.
+    Prompts without candidates produce no rows.
+    """
+    prompts = list(prompts)
+    seeds = None if seed is None else prompt_seeds(seed, start, len(prompts))
+    with metrics.stage("generate"):
+        candidate_lists = generator(prompts, n_candidates, seeds)
+    candidates = [cand for cands in candidate_lists for cand in cands]
+    # repeated candidates (same prompt twice, shared templates) are scored once
+    unique = {cand: k for k, cand in enumerate(dict.fromkeys(candidates))}
+    scores = score_batch(list(unique), matcher, workers=workers)
+    rows = [unique[cand] for cand in candidates]
+    bias_count = [scores["bias_count"][r] for r in rows]
+    bias_matches = [set(scores["bias_matches"][r]) for r in rows]
+    toxicity = [scores["toxicity"][r] for r in rows]
+    fluency = [scores["fluency"][r] for r in rows]
+    combined = [(fluency_weight * flu) - (0.5 * bcount) - (0.8 * tox)
+                for bcount, tox, flu in zip(bias_count, toxicity, fluency)]
+
+    prompt_col, selected_col, violated_col, justification_col = [], [], [], []
+    k = 0
+    for prompt, cands in zip(prompts, candidate_lists):
+        n = len(cands)
+        if not n:
+            continue
+        best = max(range(k, k + n), key=combined.__getitem__)
+        violated = bias_count[best] > bias_threshold or toxicity[best] > toxicity_threshold
+        selected = neutralize_response(prompt, bias_matches[best]) if violated else candidates[best]
+        justification = ("TRUE: Candidate exceeded bias/toxicity threshold; neutralized." if violated else
+                         "FALSE: Candidate within safe limits.")
+        prompt_col += [prompt] * n
+        selected_col += [selected] * n
+        violated_col += [violated] * n
+        justification_col += [justification] * n
+        k += n
+
+    return {
+        "prompt": prompt_col,
+        "candidate": candidates,
+        "bias_count": bias_count,
+        "bias_matches": bias_matches,
+        "toxicity": toxicity,
+        "fluency": fluency,
+        "combined": combined,
+        "final_selected": selected_col,
+        "violated": violated_col,
+        "justification": justification_col,
+    }
+
+def _decode_chunk(task):
+    """Process-pool task: decode one chunk of prompts with the worker's shared matcher."""
+    prompts, start, kwargs = task
+    return decode_batch(prompts, start=start, workers=1, **kwargs)
+
+def decode_prompts(prompts, processes=0, chunk_size=DECODE_CHUNK, **kwargs):
+    """`decode_batch` over many prompts, `chunk_size` prompts per call.
+
+    With `processes`, chunks are decoded in that many worker processes (the
+    `generator` must then be picklable and the default matcher is used).
+    Columns come back in prompt order, and with a `seed` they are identical
+    for any chunk size or process count.
+    """
+    prompts = list(prompts)
+    starts = range(0, len(prompts), chunk_size)
+    if processes and len(starts) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        if "matcher" in kwargs:
+            raise ValueError("decode_prompts: worker processes use the default matcher; drop `matcher` or processes")
+        get_bias_matcher()  # load (or build) before forking so workers inherit it
+        with ProcessPoolExecutor(processes) as pool:
+            parts = list(pool.map(_decode_chunk, [(prompts[s:s + chunk_size], s, kwargs) for s in starts]))
+    else:
+        parts = [decode_batch(prompts[s:s + chunk_size], start=s, **kwargs) for s in starts]
+    columns = {name: [] for name in DECODE_COLUMNS}
+    for part in parts:
+        for name in DECODE_COLUMNS:
+            columns[name].extend(part[name])
+    return columns
+
 def constitution_aware_decode(prompt, n_candidates=4,
                              bias_threshold=1, toxicity_threshold=0.2,
-                             fluency_weight=1.0):
-    candidates = simulated_generator(prompt, n_candidates)
-    scored = []
-    for cand in candidates:
-        bcount, bmatches = bias_score(cand)
-        tox = toxicity_score(cand)
-        flu = fluency_score(cand)
-        combined = (fluency_weight * flu) - (0.5 * bcount) - (0.8 * tox)
-        scored.append({
-            "candidate": cand,
-            "bias_count": bcount,
-            "bias_matches": bmatches,
-            "toxicity": tox,
-            "fluency": flu,
-            "combined": combined
-        })
-
-    best = max(scored, key=lambda x: x["combined"])
-    violated = best["bias_count"] > bias_threshold or best["toxicity"] > toxicity_threshold
-    final_selected = neutralize_response(prompt, best.get("bias_matches")) if violated else best["candidate"]
-
+                             fluency_weight=1.0, generator=simulated_batch_generator, seed=None):
+    """Decode a single prompt; see `decode_batch` (and `decode_prompts` for many prompts)."""
+    cols = decode_batch([prompt], n_candidates, bias_threshold, toxicity_threshold, fluency_weight,
+                        generator=generator, seed=seed, workers=1)
+    scored = [
+        {"candidate": cand, "bias_count": bcount, "bias_matches": bmatches,
+         "toxicity": tox, "fluency": flu, "combined": comb}
+        for cand, bcount, bmatches, tox, flu, comb in zip(
+            cols["candidate"], cols["bias_count"], cols["bias_matches"],
+            cols["toxicity"], cols["fluency"], cols["combined"])
+    ]
+    if not scored:
+        raise ValueError(f"generator returned no candidates for {prompt!r}")
     return {
         "prompt": prompt,
         "candidates": scored,
-        "selected": final_selected,
-        "violated": violated,
-        "justification": (
-            "TRUE: Candidate exceeded bias/toxicity threshold; neutralized." if violated else
-            "FALSE: Candidate within safe limits."
-        )
+        "selected": cols["final_selected"][0],
+        "violated": cols["violated"][0],
+        "justification": cols["justification"][0],
     }
 
 # ---------------------------
 # Run demo and export CSV
 # ---------------------------
-def run_demo(prompts, out_csv=None):
-    results = []
-    for p in prompts:
-        r = constitution_aware_decode(p)
-        for cinfo in r["candidates"]:
-            results.append({
-                "prompt": r["prompt"],
-                "candidate": cinfo["candidate"],
-                "bias_count": cinfo["bias_count"],
-                "bias_matches": ", ".join([f"{m[0]}({m[1]})" for m in cinfo["bias_matches"]]) if cinfo["bias_matches"] else "",
-                "toxicity": round(cinfo["toxicity"], 3),
-                "fluency": round(cinfo["fluency"], 3),
-                "combined": round(cinfo["combined"], 3),
-                "final_selected": r["selected"],
-                "violated": r["violated"],
-                "justification": r["justification"]
-            })
-
-    df = pd.DataFrame(results)
+def run_demo(prompts, out_csv=None, out_parquet=None, generator=simulated_batch_generator, seed=None,
+             processes=0, chunk_size=DECODE_CHUNK):
+    """Decode `prompts` (see `decode_prompts`) and return one row per candidate.
+
+    Pass `seed` for reproducible candidates and `processes` to spread chunks of
+    prompts over worker processes.
+    """
+    columns = decode_prompts(prompts, processes=processes, chunk_size=chunk_size,
+                             generator=generator, seed=seed)
+
+    import pandas as pd  # only the demo export needs pandas; keep the scoring core light
+
+    raw_matches = columns["bias_matches"]
+    df = pd.DataFrame({
+        **columns,
+        "bias_matches": [format_matches(m) for m in raw_matches],
+        "toxicity": [round(v, 3) for v in columns["toxicity"]],
+        "fluency": [round(v, 3) for v in columns["fluency"]],
+        "combined": [round(v, 3) for v in columns["combined"]],
+    }, columns=list(DECODE_COLUMNS))
 
     # Bilingual headers for readability
     headers = {
@@ -334,6 +1304,17 @@ def run_demo(prompts, out_csv=None):
         df.rename(columns=headers).to_csv(filename, index=False, encoding="utf-8-sig")
         print(f"✅ Results saved to: {filename}")
 
+    if out_parquet:
+        # Typed columns; bias_matches as list<struct<term, lang>>, bilingual headers as field metadata
+        import columnar
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        base = out_parquet[:-len(".parquet")] if out_parquet.endswith(".parquet") else out_parquet
+        filename = f"{base}_{ts}.parquet"
+        table = columnar.to_table(df.assign(bias_matches=raw_matches), headers=headers)
+        with columnar.ParquetSink(filename, metadata={"kb_version": kb_version()}) as sink:
+            sink.write(table)
+        print(f"✅ Results saved to: {filename}")
+
     return df
 
 # ---------------------------
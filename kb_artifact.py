@@ -0,0 +1,58 @@
+"""
+kb_artifact.py
+
+Build or inspect the compiled KB artifact that `costitu2.get_bias_matcher`
+loads at startup instead of rebuilding the matcher.
+
+    python kb_artifact.py build            # writes costitu2.KB_ARTIFACT_PATH
+    python kb_artifact.py build --output /tmp/kb.bin
+    python kb_artifact.py info             # shows the header and whether it is current
+
+Rebuild after editing KNOWLEDGE_BASE, LATIN_TO_NATIVE, FUZZ_THRESHOLD or
+costitu2.py; a stale artifact is ignored (and the matcher built from source).
+Set COSTITU2_KB_ARTIFACT to use a different path.
+"""
+
+import argparse
+import json
+import time
+
+import costitu2
+
+
+def build(path=costitu2.KB_ARTIFACT_PATH):
+    start = time.perf_counter()
+    matcher = costitu2.BiasMatcher()
+    built = time.perf_counter()
+    header = costitu2.save_matcher_artifact(matcher, path)
+    print(f"✅ Built {path}: {header['probes']} probes, {header['size']} bytes, "
+          f"compiled in {(built - start) * 1000:.1f}ms")
+    return header
+
+
+def info(path=costitu2.KB_ARTIFACT_PATH):
+    header = costitu2.read_artifact_header(path)
+    if header is None:
+        print(f"No artifact at {path}")
+        return False
+    print(json.dumps(header, indent=2))
+    start = time.perf_counter()
+    current = costitu2.load_matcher_artifact(path) is not None
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"{'✅ current' if current else '⚠️  stale or corrupt'} (load check {elapsed:.1f}ms)")
+    return current
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or inspect the compiled KB artifact.")
+    parser.add_argument("command", choices=["build", "info"])
+    parser.add_argument("--output", default=costitu2.KB_ARTIFACT_PATH, help="artifact path")
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        build(args.output)
+    else:
+        info(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+kb_live.py
+
+Hot-reloadable knowledge base kept in external files instead of the
+KNOWLEDGE_BASE / LATIN_TO_NATIVE literals in costitu2.py:
+
+- `<dir>/knowledge_base.json`: {"hindi": ["दलित", ...], "english": [...], ...}
+- `<dir>/latin_to_native.json`: {"dalit": {"hindi": "दलित", "tamil": "தலித்", ...}, ...}
+
+    python kb_live.py export --dir kb/    # seed the files from costitu2.py
+    python kb_live.py diff --dir kb/      # what a reload would change, and how long it takes
+
+`LiveKB(dir)` holds the current `BiasMatcher` in `.matcher`. `reload()`
+re-reads the files and, if they changed, derives a new matcher with
+`BiasMatcher.updated()` (only added / removed terms and keys are recomputed)
+and swaps it in with one reference assignment. Scoring is never paused:
+callers take `live.matcher` once per text or batch, so a batch is scored
+against one KB version, and report `matcher.version` with their results.
+`start_watching()` polls the files' mtimes in a background thread. Once the
+delta overlay grows past `compact_at` probes, a full rebuild runs in the
+background and is swapped in only if the KB did not change meanwhile.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+
+import costitu2
+
+KB_FILE = "knowledge_base.json"
+LATIN_FILE = "latin_to_native.json"
+WATCH_INTERVAL = 2.0  # seconds between mtime checks
+COMPACT_AT = 500      # overlay + retired probes before a background full rebuild
+
+
+def kb_paths(directory):
+    return os.path.join(directory, KB_FILE), os.path.join(directory, LATIN_FILE)
+
+
+def load_kb_files(directory):
+    """`(kb, latin_to_native)` from `directory`; raises ValueError on malformed files."""
+    kb_path, latin_path = kb_paths(directory)
+    with open(kb_path, encoding="utf-8") as f:
+        kb = json.load(f)
+    with open(latin_path, encoding="utf-8") as f:
+        latin_to_native = json.load(f)
+    if not isinstance(kb, dict) or not all(
+            isinstance(terms, list) and all(isinstance(t, str) for t in terms) for terms in kb.values()):
+        raise ValueError(f"{kb_path}: expected {{language: [term, ...]}}")
+    if not isinstance(latin_to_native, dict) or not all(
+            isinstance(m, dict) and all(isinstance(t, str) for t in m.values()) for m in latin_to_native.values()):
+        raise ValueError(f"{latin_path}: expected {{latin_key: {{language: native_term}}}}")
+    return kb, latin_to_native
+
+
+def save_kb_files(directory, kb=costitu2.KNOWLEDGE_BASE, latin_to_native=costitu2.LATIN_TO_NATIVE):
+    """Write `kb` / `latin_to_native` to `directory` (each file replaced atomically)."""
+    os.makedirs(directory, exist_ok=True)
+    for path, data in zip(kb_paths(directory), (kb, latin_to_native)):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+
+def describe(delta):
+    return (f"+{len(delta['added_terms'])}/-{len(delta['removed_terms'])} terms, "
+            f"+{len(delta['added_keys'])}/-{len(delta['removed_keys'])} Latin keys")
+
+
+class LiveKB:
+    """The current BiasMatcher for a KB directory, replaced atomically on reload.
+
+    `on_swap(matcher)` is called after every swap (reload or compaction).
+    """
+
+    def __init__(self, directory, threshold=costitu2.FUZZ_THRESHOLD, compact_at=COMPACT_AT, on_swap=None):
+        self.directory = directory
+        self.compact_at = compact_at
+        self.on_swap = on_swap
+        self.reloads = 0
+        self._lock = threading.Lock()  # serializes reloads and swaps; readers never take it
+        self._compacting = False
+        self._stop = None
+        self._mtimes = self._stat()
+        kb, latin_to_native = load_kb_files(directory)
+        matcher = None
+        if os.path.exists(costitu2.KB_ARTIFACT_PATH):
+            matcher = costitu2.load_matcher_artifact(costitu2.KB_ARTIFACT_PATH, kb, latin_to_native, threshold)
+        self.matcher = matcher or costitu2.BiasMatcher(kb, latin_to_native, threshold)
+
+    @property
+    def version(self):
+        return self.matcher.version
+
+    def _stat(self):
+        mtimes = []
+        for path in kb_paths(self.directory):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return mtimes
+
+    def reload(self, force=False):
+        """Apply changes in the KB files; returns the applied delta, or None if nothing changed.
+
+        A file that cannot be read or parsed is reported and skipped; the
+        current matcher stays in place until the next successful reload.
+        """
+        with self._lock:
+            mtimes = self._stat()
+            if not force and mtimes == self._mtimes:
+                return None
+            self._mtimes = mtimes
+            try:
+                kb, latin_to_native = load_kb_files(self.directory)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  KB reload skipped, keeping {self.matcher.version}: {e}")
+                return None
+            old = self.matcher
+            delta = costitu2.kb_diff(old.kb, old.latin_to_native, kb, latin_to_native)
+            if not any(delta.values()):
+                return None
+            start = time.perf_counter()
+            new = old.updated(kb, latin_to_native, delta)
+            self.matcher = new
+            self.reloads += 1
+            print(f"🔄 KB {old.version} -> {new.version}: {describe(delta)} "
+                  f"({(time.perf_counter() - start) * 1000:.1f}ms)")
+        if self.on_swap is not None:
+            self.on_swap(new)
+        if new.overlay_size + new.retired >= self.compact_at:
+            self._compact_in_background(new)
+        return delta
+
+    def _compact_in_background(self, matcher):
+        if self._compacting:
+            return
+        self._compacting = True
+
+        def run():
+            try:
+                fresh = matcher.compacted()
+                with self._lock:
+                    if self.matcher is not matcher:
+                        return  # the KB changed during the rebuild; a later reload retries
+                    self.matcher = fresh
+                print(f"🧱 KB {fresh.version} compacted ({len(fresh._probes)} probes)")
+                if self.on_swap is not None:
+                    self.on_swap(fresh)
+            finally:
+                self._compacting = False
+
+        threading.Thread(target=run, name="kb-compact", daemon=True).start()
+
+    def start_watching(self, interval=WATCH_INTERVAL):
+        """Poll the KB files every `interval` seconds in a daemon thread and reload on change."""
+        if self._stop is not None:
+            return
+        self._stop = threading.Event()
+
+        def watch(stop):
+            while not stop.wait(interval):
+                try:
+                    self.reload()
+                except Exception as e:  # keep watching; the current matcher stays valid
+                    print(f"⚠️  KB reload failed: {e}")
+
+        threading.Thread(target=watch, args=(self._stop,), name="kb-watch", daemon=True).start()
+
+    def stop_watching(self):
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or check the file-based, hot-reloadable KB.")
+    parser.add_argument("command", choices=["export", "diff"])
+    parser.add_argument("--dir", default="kb", help="KB directory")
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        save_kb_files(args.dir)
+        print(f"✅ Wrote {', '.join(kb_paths(args.dir))} ({costitu2.kb_version()})")
+        return
+    kb, latin_to_native = load_kb_files(args.dir)
+    base = costitu2.get_bias_matcher()
+    delta = costitu2.kb_diff(base.kb, base.latin_to_native, kb, latin_to_native)
+    start = time.perf_counter()
+    updated = base.updated(kb, latin_to_native, delta)
+    print(f"{describe(delta)} vs costitu2.py; update {(time.perf_counter() - start) * 1000:.1f}ms "
+          f"-> {updated.version} (overlay {updated.overlay_size}, retired {updated.retired})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+loadtest_service.py
+
+Load test for score_service.py: keep-alive clients posting synthetic texts
+(benchmark.make_corpus) for a fixed duration, reporting throughput, latency
+percentiles and how many requests were rejected with 503.
+
+    python score_service.py --port 8080 &
+    python loadtest_service.py --url http://127.0.0.1:8080 --concurrency 64 --duration 10
+
+`--rate` switches from closed-loop (each client sends as soon as it gets its
+answer) to an open-loop target of that many requests per second, which is the
+better check of latency at a given load. `--spawn` starts a service in-process
+on a free port instead of using `--url`.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import urllib.parse
+
+import benchmark
+
+
+class Client:
+    """One keep-alive HTTP/1.1 connection."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def post(self, path, payload):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode("utf-8")
+        self.writer.write(
+            f"POST {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+        await self.writer.drain()
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split(" ", 2)[1])
+        length = 0
+        for line in lines[1:]:
+            if line.lower().startswith("content-length:"):
+                length = int(line.split(":", 1)[1])
+        data = await self.reader.readexactly(length)
+        return status, data
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def run_load(url, texts, concurrency=32, duration=10.0, rate=None, batch=1):
+    """Drive the service at `url`; returns a summary dict (throughput, latency percentiles, errors)."""
+    parsed = urllib.parse.urlsplit(url)
+    host, port = parsed.hostname, parsed.port or 80
+    latencies, server_ms = [], []
+    counts = {"ok": 0, "rejected": 0, "errors": 0}
+    deadline = time.perf_counter() + duration
+    interval = concurrency / rate if rate else 0.0  # per-client send interval in open-loop mode
+
+    async def worker(index):
+        client = Client(host, port)
+        k = index
+        next_send = time.perf_counter() + (interval * index / concurrency if interval else 0)
+        try:
+            while True:
+                if interval:
+                    delay = next_send - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    next_send += interval
+                if time.perf_counter() >= deadline:
+                    return
+                chunk = [texts[(k + j) % len(texts)] for j in range(batch)]
+                k += concurrency * batch
+                payload = {"text": chunk[0]} if batch == 1 else {"texts": chunk}
+                start = time.perf_counter()
+                try:
+                    status, data = await client.post("/score", payload)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    counts["errors"] += 1
+                    client.close()
+                    client = Client(host, port)
+                    continue
+                if status == 200:
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    server_ms.append(json.loads(data)["latency_ms"])
+                    counts["ok"] += 1
+                elif status == 503:
+                    counts["rejected"] += 1
+                else:
+                    counts["errors"] += 1
+        finally:
+            client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": counts["ok"],
+        "texts": counts["ok"] * batch,
+        "rejected": counts["rejected"],
+        "errors": counts["errors"],
+        "seconds": round(elapsed, 3),
+        "rps": round(counts["ok"] / elapsed, 1),
+        "p50_ms": round(benchmark._percentile(latencies, 50), 3),
+        "p99_ms": round(benchmark._percentile(latencies, 99), 3),
+        "max_ms": round(max(latencies, default=0.0), 3),
+        "server_p99_ms": round(benchmark._percentile(server_ms, 99), 3),
+    }
+
+
+async def _spawn_and_run(args, texts):
+    import score_service
+
+    loop = asyncio.get_running_loop()
+    bound = loop.create_future()
+    server = asyncio.ensure_future(score_service.serve(
+        "127.0.0.1", 0, ready=bound.set_result, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms))
+    host, port = await bound
+    try:
+        return await run_load(f"http://{host}:{port}", texts, args.concurrency, args.duration,
+                              args.rate, args.batch)
+    finally:
+        server.cancel()
+        try:
+            await server
+        except asyncio.CancelledError:
+            pass
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test for score_service.py.")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent keep-alive connections")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--rate", type=float, default=None, help="open-loop target requests/s (default: closed loop)")
+    parser.add_argument("--batch", type=int, default=1, help="texts per request")
+    parser.add_argument("--n", type=int, default=5000, help="distinct synthetic texts to cycle through")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--spawn", action="store_true", help="start a service in-process instead of using --url")
+    parser.add_argument("--max-batch", type=int, default=64, help="service max batch (with --spawn)")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="service max wait (with --spawn)")
+    parser.add_argument("--output", default=None, help="write the summary JSON here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    texts = benchmark.make_corpus(args.n, seed=args.seed)
+    if args.spawn:
+        summary = asyncio.run(_spawn_and_run(args, texts))
+    else:
+        summary = asyncio.run(run_load(args.url, texts, args.concurrency, args.duration, args.rate, args.batch))
+    print(f"📈 {summary['rps']} req/s ({summary['requests']} ok, {summary['rejected']} rejected, "
+          f"{summary['errors']} errors) p50 {summary['p50_ms']}ms p99 {summary['p99_ms']}ms "
+          f"(server p99 {summary['server_p99_ms']}ms)")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
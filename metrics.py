@@ -0,0 +1,212 @@
+"""
+metrics.py
+
+In-process metrics registry for the scoring pipeline.
+
+Off by default. Instrumented code checks `metrics.ENABLED` (one module
+attribute lookup) before doing any work, so a disabled registry costs close to
+nothing. When enabled it records:
+
+- counters, e.g. `partial_ratio_calls_total{lang}` and `bias_matches_total{term,lang}`
+- gauges, e.g. `rows_per_second`, `queue_depth{queue}`
+- timers (count / sum / max), e.g. `stage_seconds{stage}`
+
+Profile mode (`enable(profile=True)`) also times every partial_ratio call per
+KB term (`kb_term_seconds{term,lang}`); `top_terms()` ranks terms by the CPU
+time they consumed. It is noticeably slower and meant for diagnosis only.
+
+Snapshots are plain dicts (`snapshot()`), JSON (`to_json()`) or Prometheus text
+format (`to_prometheus()`); `dump(path)` picks the format from the file suffix.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+ENABLED = False
+PROFILE = False
+PREFIX = "costitu2_"
+
+
+class Registry:
+    """Counters, gauges and timers keyed by (name, sorted label pairs)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.gauges = {}
+            self.timers = {}  # key -> [count, sum, max]
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.gauges[key] = value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            timer = self.timers.get(key)
+            if timer is None:
+                self.timers[key] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                if seconds > timer[2]:
+                    timer[2] = seconds
+
+    def snapshot(self):
+        """Current values as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                "counters": [{"name": n, "labels": dict(l), "value": v}
+                             for (n, l), v in sorted(self.counters.items())],
+                "gauges": [{"name": n, "labels": dict(l), "value": v}
+                           for (n, l), v in sorted(self.gauges.items())],
+                "timers": [{"name": n, "labels": dict(l), "count": c, "sum": s, "max": m}
+                           for (n, l), (c, s, m) in sorted(self.timers.items())],
+            }
+
+    def merge(self, snapshot):
+        """Add another registry's snapshot (e.g. from a worker process) into this one."""
+        for item in snapshot.get("counters", []):
+            self.inc(item["name"], item["value"], **item["labels"])
+        for item in snapshot.get("gauges", []):
+            self.set_gauge(item["name"], item["value"], **item["labels"])
+        for item in snapshot.get("timers", []):
+            key = (item["name"], tuple(sorted(item["labels"].items())))
+            with self._lock:
+                timer = self.timers.setdefault(key, [0, 0.0, 0.0])
+                timer[0] += item["count"]
+                timer[1] += item["sum"]
+                timer[2] = max(timer[2], item["max"])
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (timers as summaries without quantiles)."""
+        lines = []
+        snap = self.snapshot()
+
+        def emit(kind, items, render):
+            seen = set()
+            for item in items:
+                name = PREFIX + item["name"]
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f"# TYPE {name} {kind}")
+                render(name, _labels(item["labels"]), item)
+
+        emit("counter", snap["counters"], lambda n, l, i: lines.append(f"{n}{l} {i['value']}"))
+        emit("gauge", snap["gauges"], lambda n, l, i: lines.append(f"{n}{l} {i['value']}"))
+
+        def summary(name, labels, item):
+            lines.append(f"{name}_count{labels} {item['count']}")
+            lines.append(f"{name}_sum{labels} {item['sum']:.9f}")
+        emit("summary", snap["timers"], summary)
+        return "\n".join(lines) + "\n"
+
+    def top(self, name, n=20, by="sum"):
+        """Timers called `name`, largest `by` ("sum", "count" or "max") first."""
+        items = [t for t in self.snapshot()["timers"] if t["name"] == name]
+        return sorted(items, key=lambda t: -t[by])[:n]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+REGISTRY = Registry()
+
+# module-level shortcuts on the shared registry
+inc = REGISTRY.inc
+set_gauge = REGISTRY.set_gauge
+observe = REGISTRY.observe
+snapshot = REGISTRY.snapshot
+merge = REGISTRY.merge
+reset = REGISTRY.reset
+to_json = REGISTRY.to_json
+to_prometheus = REGISTRY.to_prometheus
+
+
+def enable(profile=False):
+    global ENABLED, PROFILE
+    ENABLED = True
+    PROFILE = profile
+
+
+def disable():
+    global ENABLED, PROFILE
+    ENABLED = PROFILE = False
+
+
+def mode():
+    """(enabled, profile) flags, e.g. to pass to worker-process initializers."""
+    return ENABLED, PROFILE
+
+
+def set_mode(enabled, profile=False):
+    if enabled:
+        enable(profile)
+    else:
+        disable()
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+@contextmanager
+def _timed_stage(name, labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe("stage_seconds", time.perf_counter() - start, stage=name, **labels)
+
+
+def stage(name, **labels):
+    """Context manager timing a pipeline stage into `stage_seconds{stage=name}`.
+
+    Returns a shared no-op when metrics are disabled.
+    """
+    if not ENABLED:
+        return _NULL_STAGE
+    return _timed_stage(name, labels)
+
+
+def top_terms(n=20):
+    """KB terms ranked by total partial_ratio time (profile mode), as
+    (term, lang, seconds, calls) tuples."""
+    return [(t["labels"].get("term"), t["labels"].get("lang"), t["sum"], t["count"])
+            for t in REGISTRY.top("kb_term_seconds", n)]
+
+
+def dump(path):
+    """Write the registry to `path`: Prometheus text for .prom/.txt, JSON otherwise."""
+    text = to_prometheus() if path.endswith((".prom", ".txt")) else to_json()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
@@ -0,0 +1,309 @@
+"""
+near_dup.py
+
+Near-duplicate clustering pre-pass for scoring tweet dumps.
+
+Templated campaigns post the same text with a different handle, hashtag or
+URL (and the odd changed word). `cluster()` groups such tweets:
+
+1. `normalize()` lowercases and strips @handles, #hashtags and URLs.
+2. Each distinct normalized text becomes a set of hashed word 3-shingles and
+   a MinHash signature of NUM_PERM permutations.
+3. LSH: signatures are cut into BANDS bands and texts sharing a band bucket
+   are candidates. A candidate joins a cluster only if the exact Jaccard
+   similarity of its shingles to the cluster's representative (its first
+   text) reaches `threshold`.
+
+`score_clustered()` fully scores one representative per cluster. A member
+inherits its representative's bias matches only if every region where the
+two texts differ (`changed_regions()`: a token diff, so inserted, removed,
+replaced and moved tokens all count) has the same matches nearby on both
+sides. Every KB match comes from a window no longer than the longest probe,
+and windows that touch no change are identical in both texts. So, for each
+side of a region, `_touching_probes()` bounds which probes could hit a window
+touching it (an LCS count filter, one `cdist` per probe-length group), and
+only those are run with partial_ratio against the text around the region
+(max probe length either side). Contexts cut from the middle of a text are
+padded with sentinels, so that the cut edge cannot create partial-window
+matches the full text doesn't have. Most regions (an inserted handle or URL)
+have no candidates at all, so a member costs a fraction of scoring it.
+Members where either text is no longer than the longest probe are scored
+outright. Toxicity and fluency are always the member's own, and members that
+fail the check are scored in full, so the result equals scoring every text.
+"""
+
+import re
+from itertools import accumulate
+
+import numpy as np
+from rapidfuzz import process
+from rapidfuzz.distance import Indel, LCSseq
+
+import costitu2
+import metrics
+
+NUM_PERM = 64      # MinHash permutations
+BANDS = 16         # LSH bands (NUM_PERM / BANDS rows each; candidate threshold ~ (1/16) ** (1/4) = 0.5)
+THRESHOLD = 0.7    # minimum shingle Jaccard similarity to a cluster's representative
+SHINGLE = 3        # words per shingle
+_PRIME = (1 << 31) - 1
+
+_STRIP = re.compile(r"https?://\S+|www\.\S+|[@#]\w+", re.UNICODE)
+
+
+def normalize(text):
+    """Lowercased text with URLs, @handles and #hashtags removed and whitespace collapsed."""
+    return " ".join(_STRIP.sub(" ", text.lower()).split())
+
+
+def shingles(word_ids, k=SHINGLE):
+    """Set of hashed word k-shingles (the whole text if it has fewer than k words).
+
+    `word_ids` are the text's words as small ints, so the hashes are stable
+    across processes (str hashes are salted per process).
+    """
+    if len(word_ids) <= k:
+        return {hash(tuple(word_ids))} if word_ids else set()
+    return {hash(tuple(word_ids[i:i + k])) for i in range(len(word_ids) - k + 1)}
+
+
+def minhash_signatures(shingle_sets, num_perm=NUM_PERM, seed=0):
+    """(n, num_perm) uint64 MinHash signatures; empty sets get an all-max row."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+    b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+    sizes = np.fromiter((len(s) for s in shingle_sets), dtype=np.int64, count=len(shingle_sets))
+    signatures = np.full((len(shingle_sets), num_perm), np.iinfo(np.uint64).max, dtype=np.uint64)
+    filled = np.nonzero(sizes)[0]
+    if not len(filled):
+        return signatures
+    hashes = np.fromiter((h for i in filled for h in shingle_sets[i]), dtype=np.int64, count=int(sizes.sum()))
+    hashes = (hashes % _PRIME).astype(np.uint64)
+    starts = np.concatenate(([0], np.cumsum(sizes[filled])[:-1]))
+    for j in range(num_perm):
+        # a, b < 2**31 and hashes < 2**31, so a * h + b fits in uint64
+        signatures[filled, j] = np.minimum.reduceat((a[j] * hashes + b[j]) % _PRIME, starts)
+    return signatures
+
+
+def cluster(texts, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS, seed=0):
+    """Representative position for each text (its own position if it starts a cluster).
+
+    Texts are taken in order, so a cluster's representative is its first text.
+    Texts that normalize to nothing are left as singletons.
+    """
+    normalized = [normalize(t) for t in texts]
+    first = {}  # normalized text -> first position; identical texts are hashed and looked up once
+    for i, norm in enumerate(normalized):
+        first.setdefault(norm, i)
+    vocab = {}
+    sets = [shingles([vocab.setdefault(w, len(vocab)) for w in norm.split()]) for norm in first]
+    signatures = minhash_signatures(sets, num_perm, seed)
+    rows = num_perm // bands
+    buckets = [{} for _ in range(bands)]
+    rep_of_unique = []
+    for u, shingle_set in enumerate(sets):
+        rep = None
+        keys = [signatures[u, band * rows:(band + 1) * rows].tobytes() for band in range(bands)]
+        if shingle_set:
+            seen = set()
+            for band, key in enumerate(keys):
+                for candidate in buckets[band].get(key, ()):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    other = sets[candidate]
+                    if len(shingle_set & other) >= threshold * len(shingle_set | other):
+                        rep = candidate
+                        break
+                if rep is not None:
+                    break
+        if rep is None:
+            rep = u
+            if shingle_set:
+                for band, key in enumerate(keys):
+                    buckets[band].setdefault(key, []).append(u)
+        rep_of_unique.append(rep)
+    position = list(first.values())
+    index_of = {norm: u for u, norm in enumerate(first)}
+    return [position[rep_of_unique[index_of[norm]]] if norm else i for i, norm in enumerate(normalized)]
+
+
+_SENTINEL = "\x00"  # occurs in no KB probe
+_TOKEN = re.compile(r"\s*\S+|\s+")  # a token with its leading whitespace; tokens concatenate back to the text
+_LENGTH_CLASSES = (4, 9, 14)  # probe-length cuts for the LCS bound; the last class runs to the longest probe
+
+
+def changed_regions(mine, theirs):
+    """Character spans where `mine` and `theirs` differ, as `((start, end) in mine,
+    (start, end) in theirs)` pairs, in order.
+
+    The texts are diffed as token sequences (tokens keep their leading
+    whitespace, so equal runs are equal character for character), so moved
+    tokens count as changed. Adjacent changes form one region.
+    """
+    mine_tokens, theirs_tokens = _TOKEN.findall(mine), _TOKEN.findall(theirs)
+    mine_at = list(accumulate(map(len, mine_tokens), initial=0))
+    theirs_at = list(accumulate(map(len, theirs_tokens), initial=0))
+    regions = []
+    for tag, i1, i2, j1, j2 in Indel.opcodes(theirs_tokens, mine_tokens):
+        if tag == "equal":
+            continue
+        region = ((mine_at[j1], mine_at[j2]), (theirs_at[i1], theirs_at[i2]))
+        if regions and region[0][0] == regions[-1][0][1] and region[1][0] == regions[-1][1][1]:
+            (start, _), (theirs_start, _) = regions[-1]
+            region = ((start, region[0][1]), (theirs_start, region[1][1]))
+            regions[-1] = region
+        else:
+            regions.append(region)
+    return regions
+
+
+def _context(low, start, end, span):
+    """`low[start:end]` with `span` characters either side; a cut side is padded with
+    `span` sentinels, so windows at the cut can't match more than the real text there."""
+    before = low[max(0, start - span):start]
+    after = low[end:end + span]
+    if start - span > 0:
+        before = _SENTINEL * span + before
+    if end + span < len(low):
+        after = after + _SENTINEL * span
+    return before + low[start:end] + after
+
+
+def _touching_probes(matcher, sides, workers=-1):
+    """{side: ids of the probes that may hit a text window touching it} for
+    `(low, start, end)` sides; sides with none are left out.
+
+    partial_ratio needs an LCS of at least ceil(m * threshold / 100) between a
+    probe of length m and a window of its own length, and of m * threshold /
+    (200 - threshold) for the shorter windows it tries at the very start and
+    end of a text (see `costitu2._overlap_slack`). Every window of a probe no
+    longer than k that touches `low[start:end]` lies in `low[start - k + 1:
+    end + k - 1]`, so a probe whose LCS with that span is below its need can't
+    hit there. Probes are grouped by length (k = the longest in the group) and
+    each group is bounded with one `cdist` over all the spans.
+    """
+    threshold = min(max(matcher.threshold, 0), 100)
+    patterns = matcher.patterns
+    lengths = np.array([len(p) for p in patterns], dtype=np.int64)
+    need_full = np.ceil(lengths * threshold / 100 - 1e-9).astype(np.int64)[:, None]
+    need_edge = np.ceil(lengths * threshold / (200 - threshold) - 1e-9).astype(np.int64)[:, None]
+    sides = list(sides)
+    starts = np.fromiter((start for _, start, _ in sides), dtype=np.int64, count=len(sides))
+    room = np.fromiter((len(low) - end for low, _, end in sides), dtype=np.int64, count=len(sides))
+    cuts = (0,) + _LENGTH_CLASSES + (max(_LENGTH_CLASSES[-1], matcher.max_probe_length),)
+    found = {}
+    for lo, k in zip(cuts, cuts[1:]):
+        ids = np.flatnonzero((lengths > lo) & (lengths <= k))  # retired probes ("") never hit
+        if not len(ids):
+            continue
+        near_edge = (starts < k - 1) | (room < k - 1)  # a shorter start / end window may touch it
+        for at_edge, need in ((False, need_full), (True, need_edge)):
+            cols = np.flatnonzero(near_edge == at_edge)
+            if not len(cols):
+                continue
+            spans = [low[max(0, start - k + 1):end + k - 1] for low, start, end in map(sides.__getitem__, cols.tolist())]
+            lcs = process.cdist([patterns[i] for i in ids], spans, scorer=LCSseq.similarity,
+                                dtype=np.int32, workers=workers)
+            ok = lcs >= need[ids]
+            for j in ok.any(axis=0).nonzero()[0]:
+                found.setdefault(sides[cols[j]], set()).update(ids[ok[:, j]].tolist())
+    return found
+
+
+def score_clustered(texts, matcher=None, workers=-1, cache=None, threshold=THRESHOLD):
+    """`costitu2.score_batch` columns for `texts`, scoring one representative per
+    near-duplicate cluster (see module docstring), plus `rep`: each text's
+    representative position and `scored`: how many texts were scored in full.
+    """
+    texts = [t if isinstance(t, str) else str(t) for t in texts]
+    matcher = matcher or (cache.matcher if cache is not None else costitu2.get_bias_matcher())
+
+    def score(batch):
+        if cache is not None:
+            return cache.score_many(batch, workers=workers)
+        return costitu2.score_batch(batch, matcher, workers=workers)
+
+    with metrics.stage("near_dup_cluster"):
+        rep_of = cluster(texts, threshold)
+    reps = sorted(set(rep_of))
+    scored = score([texts[r] for r in reps])
+    row_of = {r: k for k, r in enumerate(reps)}
+
+    n = len(texts)
+    bias_count, bias_matches = [0] * n, [None] * n
+    toxicity, fluency = [0.0] * n, [0.0] * n
+    for r, k in row_of.items():
+        bias_count[r], bias_matches[r] = scored["bias_count"][k], scored["bias_matches"][k]
+        toxicity[r], fluency[r] = scored["toxicity"][k], scored["fluency"][k]
+
+    with metrics.stage("near_dup_confirm"):
+        span = matcher.max_probe_length
+        lows = {}
+        plan = []  # (member, [(member side, rep side), ...] or None); a side is (text, start, end)
+        sides = set()
+        for i, r in enumerate(rep_of):
+            if i == r:
+                continue
+            for k in (i, r):
+                if k not in lows:
+                    lows[k] = texts[k].lower()
+            mine, theirs = lows[i], lows[r]
+            if mine == theirs:
+                plan.append((i, []))
+                continue
+            if min(len(mine), len(theirs)) <= span:
+                plan.append((i, None))  # a probe as long as the text swaps partial_ratio's roles
+                continue
+            regions = []
+            for m_region, t_region in changed_regions(mine, theirs):
+                region = (mine, *m_region), (theirs, *t_region)
+                sides.update(region)
+                regions.append(region)
+            plan.append((i, regions))
+
+        # A side's own matches near its change: its candidates that hit its context. The two texts
+        # share every window that touches no change, so equal side matches mean equal text matches.
+        candidates = _touching_probes(matcher, sides, workers)
+        pair_probes, pair_texts, pair_sides = [], [], []
+        for side, probes in candidates.items():
+            pair_probes += probes
+            pair_texts += [_context(*side, span)] * len(probes)
+            pair_sides += [side] * len(probes)
+        hits = {}
+        if pair_probes:
+            for k in matcher.probe_hits(pair_probes, pair_texts, workers).nonzero()[0]:
+                hits.setdefault(pair_sides[k], []).append(pair_probes[k])
+        side_matches = {side: matcher.matches_of(probes) for side, probes in hits.items()}
+        none = set()
+
+        rescore = []
+        for i, regions in plan:
+            if regions is None or any(side_matches.get(m_side, none) != side_matches.get(t_side, none)
+                                      for m_side, t_side in regions):
+                rescore.append(i)
+                continue
+            r = rep_of[i]
+            bias_count[i], bias_matches[i] = bias_count[r], set(bias_matches[r])
+            toxicity[i] = costitu2.toxicity_score(texts[i])
+            fluency[i] = costitu2.fluency_score(texts[i])
+
+    if rescore:
+        rescored = score([texts[i] for i in rescore])
+        for k, i in enumerate(rescore):
+            bias_count[i], bias_matches[i] = rescored["bias_count"][k], rescored["bias_matches"][k]
+            toxicity[i], fluency[i] = rescored["toxicity"][k], rescored["fluency"][k]
+
+    if metrics.ENABLED:
+        metrics.inc("near_dup_clusters_total", len(reps))
+        metrics.inc("near_dup_inherited_total", n - len(reps) - len(rescore))
+        metrics.inc("near_dup_rescored_total", len(rescore))
+    return {
+        "bias_count": bias_count,
+        "bias_matches": bias_matches,
+        "toxicity": toxicity,
+        "fluency": fluency,
+        "rep": rep_of,
+        "scored": len(reps) + len(rescore),
+    }
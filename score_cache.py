@@ -0,0 +1,176 @@
+"""
+score_cache.py
+
+Content-addressed cache for per-text scores (bias matches, toxicity, fluency).
+
+Political dumps are full of retweets and copy-paste campaigns, so identical
+texts are scored many times. Entries are keyed by a hash of the normalized
+text plus a scorer version built from the KB, the Latin mapping,
+FUZZ_THRESHOLD and TOXIC_KEYWORDS, so editing any of those invalidates the
+cache.
+
+Tiers:
+- in-process LRU (`max_entries`)
+- optional SQLite file (`db_path`) shared by repeat runs and worker processes
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import costitu2
+
+
+def normalize(text):
+    """Cache-key normalization. Every score depends only on the lowercased text."""
+    return text.lower()
+
+
+def scorer_version(matcher):
+    """Version string covering everything that affects a cached score."""
+    payload = json.dumps([matcher.version, matcher.threshold, sorted(costitu2.TOXIC_KEYWORDS)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class ScoreCache:
+    """Two-tier score cache. Values are `(bias_matches, toxicity, fluency)`."""
+
+    def __init__(self, max_entries=100000, db_path=None, matcher=None):
+        self.matcher = matcher or costitu2.get_bias_matcher()
+        self.version = scorer_version(self.matcher)
+        self.max_entries = max_entries
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS scores ("
+                "key TEXT PRIMARY KEY, version TEXT, matches TEXT, toxicity REAL, fluency REAL)"
+            )
+            # Entries from another KB / threshold can never be hit again
+            self._db.execute("DELETE FROM scores WHERE version != ?", (self.version,))
+            self._db.commit()
+
+    def key(self, text):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.version.encode("ascii"))
+        digest.update(b"\0")
+        digest.update(normalize(text).encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def _remember(self, key, value):
+        # caller holds the lock
+        if self.max_entries <= 0:
+            return
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+            self.evictions += 1
+
+    def _lookup(self, key):
+        with self._lock:
+            value = self._lru.get(key)
+            if value is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return value
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT matches, toxicity, fluency FROM scores WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value = (frozenset(map(tuple, json.loads(row[0]))), row[1], row[2])
+                    self._remember(key, value)
+                    self.disk_hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def _store(self, items):
+        with self._lock:
+            for key, value in items:
+                self._remember(key, value)
+            if self._db is not None and items:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?)",
+                    [(key, self.version, json.dumps(sorted(matches), ensure_ascii=False), tox, flu)
+                     for key, (matches, tox, flu) in items],
+                )
+                self._db.commit()
+
+    def get(self, text):
+        return self._lookup(self.key(text))
+
+    def put(self, text, value):
+        matches, tox, flu = value
+        self._store([(self.key(text), (frozenset(matches), tox, flu))])
+
+    def score(self, text):
+        """Return `(bias_matches, toxicity, fluency)` for one text, computing it on a miss."""
+        key = self.key(text)
+        value = self._lookup(key)
+        if value is None:
+            scores = costitu2.score_text(text, self.matcher)
+            value = (frozenset(scores["bias_matches"]), scores["toxicity"], scores["fluency"])
+            self._store([(key, value)])
+        return value
+
+    def score_many(self, texts, workers=-1):
+        """Cached counterpart of `costitu2.score_batch`: same columns, misses scored in one batch."""
+        texts = [t if isinstance(t, str) else str(t) for t in texts]
+        keys = [self.key(t) for t in texts]
+        values = {}
+        todo = {}
+        for key, text in zip(keys, texts):
+            if key in values or key in todo:
+                # repeat within the batch: served by the first occurrence
+                with self._lock:
+                    self.hits += 1
+                continue
+            value = self._lookup(key)
+            if value is None:
+                todo[key] = text
+            else:
+                values[key] = value
+
+        if todo:
+            scored = costitu2.score_batch(list(todo.values()), matcher=self.matcher, workers=workers)
+            fresh = [
+                (key, (frozenset(m), tox, flu))
+                for key, m, tox, flu in zip(todo, scored["bias_matches"], scored["toxicity"], scored["fluency"])
+            ]
+            self._store(fresh)
+            values.update(fresh)
+
+        rows = [values[key] for key in keys]
+        return {
+            "bias_count": [len(m) for m, _, _ in rows],
+            "bias_matches": [set(m) for m, _, _ in rows],
+            "toxicity": [tox for _, tox, _ in rows],
+            "fluency": [flu for _, _, flu in rows],
+        }
+
+    def stats(self):
+        """Counters for sizing the cache."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._lru),
+                "max_entries": self.max_entries,
+            }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
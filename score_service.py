@@ -0,0 +1,340 @@
+"""
+score_service.py
+
+Long-running local scoring service that keeps the KB matcher warm.
+
+    python score_service.py --port 8080
+    curl -s localhost:8080/score -d '{"text": "Dalit rights rally"}'
+    curl -s localhost:8080/score -d '{"texts": ["...", "..."]}'
+
+Endpoints:
+- POST /score   {"text": ...} or {"texts": [...]} -> {"results": [...], "latency_ms"}
+  Each result has bias_count, bias_matches ([{term, lang}]), toxicity, fluency, violated and kb_version.
+- GET /health   queue depth, batches scored, KB version
+- GET /metrics  Prometheus text (when started with --metrics)
+
+With --kb-dir the KB is read from files (see kb_live.py) and changes are applied
+while serving; every result carries the `kb_version` it was scored with.
+
+Concurrent requests are pooled into micro-batches and scored with one
+`costitu2.score_batch` call. A batch is sent as soon as the scorer is free,
+and only lingers (up to --max-wait-ms) when recent arrivals say more requests
+are about to come, so batches grow with load instead of adding latency at low
+load. When more than --max-queue texts are waiting, new requests get 503 with
+Retry-After instead of queueing without bound; a request with more texts than
+--max-queue (or MAX_TEXTS_PER_REQUEST) gets 413, since it could never fit.
+
+Plain asyncio streams, HTTP/1.1 keep-alive, no extra dependencies.
+Load test: python loadtest_service.py --url http://127.0.0.1:8080
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import costitu2
+import metrics
+from score_cache import ScoreCache
+
+BIAS_THRESHOLD = 1
+TOXICITY_THRESHOLD = 0.2
+MAX_TEXTS_PER_REQUEST = 1000
+MAX_BODY_BYTES = 4 * 1024 * 1024
+
+
+class Overloaded(Exception):
+    """Raised when the batch queue is full; the request should be retried later."""
+
+
+# ---------------------------
+# Micro-batching
+# ---------------------------
+class MicroBatcher:
+    """Collects texts from concurrent requests and scores them in batches.
+
+    `max_batch` bounds a batch, `max_wait_ms` bounds how long a batch lingers for
+    more arrivals, and `max_queue` bounds texts waiting to be scored. With a
+    `live_kb` (kb_live.LiveKB) each batch is scored with its current matcher.
+    """
+
+    def __init__(self, matcher=None, max_batch=64, max_wait_ms=2.0, max_queue=10000,
+                 cache=None, workers=1, live_kb=None):
+        self.live_kb = live_kb
+        self._matcher = matcher if live_kb is None else None
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.cache = cache
+        self.workers = workers
+        self.queued = 0
+        self.batches = 0
+        self.scored = 0
+        self._queue = None
+        self._arrival_gap = None  # moving average of seconds between arrivals
+        self._last_arrival = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scorer")
+        self._task = None
+
+    @property
+    def matcher(self):
+        if self.live_kb is not None:
+            return self.live_kb.matcher
+        if self._matcher is None:
+            self._matcher = costitu2.get_bias_matcher()
+        return self._matcher
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=False)
+
+    async def score(self, texts):
+        """Score `texts` as part of the next batches; raises Overloaded if the queue is full."""
+        if self.queued + len(texts) > self.max_queue:
+            raise Overloaded()
+        now = time.perf_counter()
+        if self._last_arrival is not None:
+            gap = now - self._last_arrival
+            self._arrival_gap = gap if self._arrival_gap is None else 0.8 * self._arrival_gap + 0.2 * gap
+        self._last_arrival = now
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in texts]
+        for text, future in zip(texts, futures):
+            self._queue.put_nowait((text, future))
+        self.queued += len(texts)
+        if metrics.ENABLED:
+            metrics.set_gauge("queue_depth", self.queued, queue="score_service")
+        return await asyncio.gather(*futures)
+
+    def _expect_more(self, waited):
+        """True if another arrival is likely before max_wait runs out."""
+        gap = self._arrival_gap
+        return gap is not None and gap < self.max_wait - waited
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        start = time.perf_counter()
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            waited = time.perf_counter() - start
+            if not self._expect_more(waited):
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), self.max_wait - waited))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _score_texts(self, texts):
+        """Scores plus the version of the matcher they came from (one matcher per batch)."""
+        matcher = self.matcher
+        if self.cache is not None:
+            if self.cache.matcher is not matcher:
+                # KB swapped: cached scores belong to the old version
+                self.cache = ScoreCache(self.cache.max_entries, None, matcher)
+            return self.cache.score_many(texts, workers=self.workers), matcher.version
+        return costitu2.score_batch(texts, matcher, workers=self.workers), matcher.version
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            texts = [text for text, _ in batch]
+            start = time.perf_counter()
+            try:
+                scores, version = await loop.run_in_executor(self._executor, self._score_texts, texts)
+            except Exception as e:  # fail this batch's requests, keep serving
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                self.queued -= len(batch)
+                continue
+            self.queued -= len(batch)
+            self.batches += 1
+            self.scored += len(batch)
+            if metrics.ENABLED:
+                metrics.observe("stage_seconds", time.perf_counter() - start, stage="service_batch")
+                metrics.observe("batch_size", len(batch))
+            for k, (_, future) in enumerate(batch):
+                if future.done():  # client went away
+                    continue
+                bias_count, toxicity = scores["bias_count"][k], scores["toxicity"][k]
+                future.set_result({
+                    "bias_count": bias_count,
+                    "bias_matches": [{"term": t, "lang": l} for t, l in sorted(scores["bias_matches"][k])],
+                    "toxicity": round(toxicity, 3),
+                    "fluency": round(scores["fluency"][k], 3),
+                    "violated": bias_count > BIAS_THRESHOLD or toxicity > TOXICITY_THRESHOLD,
+                    "kb_version": version,
+                })
+
+
+# ---------------------------
+# HTTP
+# ---------------------------
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class ScoreService:
+    """Minimal HTTP/1.1 (keep-alive) front end for a MicroBatcher."""
+
+    def __init__(self, batcher):
+        self.batcher = batcher
+
+    async def handle(self, method, path, body):
+        """Returns (status, payload, extra_headers)."""
+        if path == "/health" and method == "GET":
+            return 200, {"status": "ok", "queued": self.batcher.queued, "batches": self.batcher.batches,
+                         "scored": self.batcher.scored, "kb_version": self.batcher.matcher.version}, {}
+        if path == "/metrics" and method == "GET":
+            return 200, metrics.to_prometheus(), {"Content-Type": "text/plain; version=0.0.4"}
+        if path != "/score":
+            return 404, {"error": "not found"}, {}
+        if method != "POST":
+            return 405, {"error": "use POST"}, {}
+
+        start = time.perf_counter()
+        try:
+            request = json.loads(body or b"{}")
+            texts = [request["text"]] if "text" in request else request["texts"]
+            if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                raise ValueError
+        except (ValueError, KeyError, TypeError):
+            return 400, {"error": 'expected {"text": str} or {"texts": [str, ...]}'}, {}
+        # more texts than the queue can ever hold would get 503 forever: reject them outright
+        limit = min(MAX_TEXTS_PER_REQUEST, self.batcher.max_queue)
+        if len(texts) > limit:
+            return 413, {"error": f"at most {limit} texts per request"}, {}
+        try:
+            results = await self.batcher.score(texts)
+        except Overloaded:
+            if metrics.ENABLED:
+                metrics.inc("requests_rejected_total", reason="queue_full")
+            return 503, {"error": "queue full, retry later"}, {"Retry-After": "1"}
+        latency_ms = (time.perf_counter() - start) * 1000
+        if metrics.ENABLED:
+            metrics.observe("request_seconds", latency_ms / 1000)
+        return 200, {"results": results, "latency_ms": round(latency_ms, 3)}, {}
+
+    async def serve_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # the body's extent is unknown, so the connection can't be reused
+                    status, payload, extra = 400, {"error": "invalid Content-Length"}, {}
+                    keep_alive = False
+                elif length > MAX_BODY_BYTES:
+                    status, payload, extra = 413, {"error": "body too large"}, {}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    try:
+                        status, payload, extra = await self.handle(method, target.split("?", 1)[0], body)
+                    except Exception as e:
+                        status, payload, extra = 500, {"error": str(e)}, {}
+                    keep_alive = (headers.get("connection", "").lower() != "close"
+                                  and version.upper() != "HTTP/1.0")
+                data = payload.encode("utf-8") if isinstance(payload, str) else \
+                    json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                out = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                       f"Content-Type: {extra.pop('Content-Type', 'application/json')}",
+                       f"Content-Length: {len(data)}",
+                       f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                out += [f"{k}: {v}" for k, v in extra.items()]
+                writer.write(("\r\n".join(out) + "\r\n\r\n").encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            return
+        finally:
+            writer.close()
+
+
+async def serve(host="127.0.0.1", port=8080, ready=None, **batcher_kwargs):
+    """Run the service until cancelled. `ready` (an asyncio.Event or callable) fires once listening."""
+    batcher = MicroBatcher(**batcher_kwargs)
+    batcher.start()
+    service = ScoreService(batcher)
+    server = await asyncio.start_server(service.serve_connection, host, port, backlog=1024)
+    bound = server.sockets[0].getsockname()
+    print(f"🚀 Scoring service on http://{bound[0]}:{bound[1]} (KB {batcher.matcher.version}, "
+          f"max batch {batcher.max_batch}, max wait {batcher.max_wait * 1000:.1f}ms, max queue {batcher.max_queue})")
+    if ready is not None:
+        ready(bound) if callable(ready) else ready.set()
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.stop()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local micro-batching scoring service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch", type=int, default=64, help="max texts per scoring batch")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="max time a batch lingers for more arrivals")
+    parser.add_argument("--max-queue", type=int, default=10000, help="waiting texts before requests get 503")
+    parser.add_argument("--cache-size", type=int, default=100000, help="in-memory score cache entries (0 disables)")
+    parser.add_argument("--metrics", action="store_true", help="record metrics and serve them on /metrics")
+    parser.add_argument("--kb-dir", default=None, help="load the KB from this directory and reload it on change")
+    parser.add_argument("--watch-interval", type=float, default=2.0, help="seconds between KB file checks")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.metrics:
+        metrics.enable()
+    live_kb = None
+    if args.kb_dir:
+        import kb_live
+
+        live_kb = kb_live.LiveKB(args.kb_dir)
+        live_kb.start_watching(args.watch_interval)
+    matcher = live_kb.matcher if live_kb is not None else costitu2.get_bias_matcher()
+    cache = ScoreCache(args.cache_size, None, matcher) if args.cache_size > 0 else None
+    try:
+        asyncio.run(serve(args.host, args.port, matcher=matcher, max_batch=args.max_batch,
+                          max_wait_ms=args.max_wait_ms, max_queue=args.max_queue, cache=cache,
+                          live_kb=live_kb))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,43 @@
+import argparse
+import io
+import mmap
 import pandas as pd
-import sys
 import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
-# Ensure we can import from the current directory
-sys.path.append(os.getcwd())
+from costitu2 import score_text, score_batch, classify_text, format_matches, get_bias_matcher
+from score_cache import ScoreCache
+from near_dup import score_clustered
+import checkpoint
+import metrics
 
-from costitu2 import bias_score, toxicity_score
+# Rows per chunk when --workers is given without --chunksize
+DEFAULT_CHUNKSIZE = 10000
+# Every read mode keeps passthrough columns as the input's text: per-chunk type inference
+# would format a column differently from chunk to chunk (2 vs 2.0) and give Parquet
+# row groups clashing types ('1.2k' in an int64 column), and the whole-file read uses
+# the same options so all modes write the same output.
+READ_OPTIONS = {"sep": "|", "dtype": str, "keep_default_na": False}
 
-def evaluate_tweet(text):
+def evaluate_tweet(text, matcher=None, cache=None):
     """
     Evaluates a single tweet for bias and toxicity.
     Returns a dictionary with scores and violation status.
+    `matcher` is an optional prebuilt costitu2.BiasMatcher (defaults to the shared one);
+    `cache` is an optional score_cache.ScoreCache that is consulted first.
     """
     if not isinstance(text, str):
         text = str(text)
         
-    bias_count, bias_matches = bias_score(text)
-    toxicity = toxicity_score(text)
+    if cache is not None:
+        bias_matches, toxicity, _ = cache.score(text)
+        bias_count = len(bias_matches)
+    else:
+        scores = score_text(text, matcher)
+        bias_count, bias_matches = scores["bias_count"], scores["bias_matches"]
+        toxicity = scores["toxicity"]
     
     # Thresholds from costitu2.py
     # bias_threshold=1, toxicity_threshold=0.2
@@ -24,17 +45,474 @@ def evaluate_tweet(text):
     
     return {
         "bias_count": bias_count,
-        "bias_matches": ", ".join([f"{m[0]}({m[1]})" for m in bias_matches]) if bias_matches else "",
+        "bias_matches": format_matches(bias_matches),
         "toxicity": round(toxicity, 3),
         "violated": violated
     }
 
-def main():
-    input_file = '11th_hour_political_tweets.csv'
-    
+def evaluate_batch(texts, matcher=None, workers=-1, cache=None, raw_matches=False, near_dup=None):
+    """
+    Evaluates a batch of tweets in one costitu2.score_batch call
+    (only the cache misses, when a score_cache.ScoreCache is given).
+    Returns a DataFrame with the same columns evaluate_tweet produces, one row per text.
+    raw_matches keeps 'bias_matches' as (term, lang) sets instead of formatted strings.
+    near_dup (a Jaccard threshold) scores one tweet per near-duplicate cluster via
+    near_dup.score_clustered and adds 'cluster_id', the position of each row's representative.
+    """
+    if near_dup:
+        scores = score_clustered(list(texts), matcher=matcher, workers=workers, cache=cache, threshold=near_dup)
+    elif cache is not None:
+        scores = cache.score_many(list(texts), workers=workers)
+    else:
+        scores = score_batch(list(texts), matcher=matcher, workers=workers)
+    bias_count = scores["bias_count"]
+    toxicity = scores["toxicity"]
+
+    results = pd.DataFrame({
+        "bias_count": bias_count,
+        "bias_matches": scores["bias_matches"] if raw_matches else [format_matches(m) for m in scores["bias_matches"]],
+        "toxicity": [round(t, 3) for t in toxicity],
+        # Same thresholds as evaluate_tweet
+        "violated": [(b > 1) or (t > 0.2) for b, t in zip(bias_count, toxicity)],
+    })
+    if near_dup:
+        results["cluster_id"] = scores["rep"]
+    return results
+
+def classify_batch(texts, matcher=None):
+    """
+    Classify-only evaluation: just the 'violated' column, via costitu2.classify_text,
+    which stops scanning each tweet as soon as its verdict is certain.
+    """
+    texts = [t if isinstance(t, str) else str(t) for t in texts]
+    return pd.DataFrame({"violated": [classify_text(t, matcher) for t in texts]}, dtype=bool)
+
+def segregate(df, matcher=None, workers=-1, cache=None, classify_only=False, raw_matches=False, near_dup=None):
+    """
+    Scores the 'full_text' column of df and splits the rows.
+    Returns (safe_tweets, violated_tweets), each with the original columns plus the score columns
+    (only 'violated' when classify_only is set).
+    `workers` is passed to costitu2.score_batch (-1 = all cores).
+    raw_matches keeps 'bias_matches' as sets (for columnar output).
+    near_dup enables the near-duplicate pre-pass (see evaluate_batch); 'cluster_id' is then the
+    df index label of each row's cluster representative. Ignored with classify_only.
+    """
+    with metrics.stage("score"):
+        if classify_only:
+            results_df = classify_batch(df['full_text'], matcher=matcher)
+        else:
+            results_df = evaluate_batch(df['full_text'], matcher=matcher, workers=workers, cache=cache,
+                                        raw_matches=raw_matches, near_dup=near_dup)
+    if metrics.ENABLED:
+        metrics.inc("rows_scored_total", len(df))
+    # Align with df so chunks that don't start at row 0 concatenate correctly
+    results_df.index = df.index
+    if "cluster_id" in results_df.columns:
+        results_df["cluster_id"] = df.index[results_df["cluster_id"].to_numpy()]
+
+    # Concatenate with original dataframe
+    df_processed = pd.concat([df, results_df], axis=1)
+
+    # Segregate
+    safe_tweets = df_processed[~df_processed['violated']]
+    violated_tweets = df_processed[df_processed['violated']]
+    return safe_tweets, violated_tweets
+
+# Per-process score cache, set up by _init_worker
+_CACHE = None
+# True in pool workers: their metrics are shipped back with each chunk
+_SHIP_METRICS = False
+
+def _init_worker(cache_size=0, cache_db=None, metrics_mode=None):
+    """
+    Process-pool initializer (also used by the serial path): build the KB matcher and
+    the score cache once per process rather than per task.
+    metrics_mode is the parent's metrics.mode(), given only to pool workers.
+    """
+    global _CACHE, _SHIP_METRICS
+    if metrics_mode is not None:
+        # forked workers inherit the parent's samples; start from zero so merging doesn't double count
+        metrics.reset()
+        metrics.set_mode(*metrics_mode)
+        _SHIP_METRICS = metrics_mode[0]
+    matcher = get_bias_matcher()
+    _CACHE = ScoreCache(cache_size, cache_db, matcher) if (cache_size > 0 or cache_db) else None
+
+def _score_chunk(index, chunk, workers=-1, classify_only=False, out_format="csv", near_dup=None):
+    """
+    Scores one chunk and renders both halves for the output format: CSV text
+    (header only on chunk 0) or Arrow tables for out_format="parquet".
+    Returns (rows, safe_rows, violated_rows, safe_out, violated_out,
+    (pid, cache_stats, metrics_snapshot)); the snapshot is None outside pool workers.
+    """
+    parquet = out_format == "parquet"
+    safe_tweets, violated_tweets = segregate(chunk, workers=workers, cache=_CACHE, classify_only=classify_only,
+                                             raw_matches=parquet, near_dup=near_dup)
+    header = index == 0
+    with metrics.stage("render_" + out_format):
+        if parquet:
+            import columnar
+            safe_csv, violated_csv = columnar.to_table(safe_tweets), columnar.to_table(violated_tweets)
+        else:
+            safe_csv = safe_tweets.to_csv(index=False, header=header)
+            violated_csv = violated_tweets.to_csv(index=False, header=header)
+    snapshot = None
+    if _SHIP_METRICS:
+        snapshot = metrics.snapshot()
+        metrics.reset()
+    return (len(chunk), len(safe_tweets), len(violated_tweets), safe_csv, violated_csv,
+            (os.getpid(), _CACHE.stats() if _CACHE is not None else None, snapshot))
+
+_END = object()
+
+def _timed(iterable, stage):
+    """Yield from iterable, timing each step as a metrics stage (e.g. CSV chunk parsing)."""
+    iterator = iter(iterable)
+    while True:
+        with metrics.stage(stage):
+            item = next(iterator, _END)
+        if item is _END:
+            return
+        yield item
+
+def print_cache_stats(stats):
+    print(f"Cache: {stats['hits']} hits, {stats['disk_hits']} disk hits, {stats['misses']} misses, "
+          f"{stats['evictions']} evictions")
+
+def _open_output(path, out_format):
+    """Output for segregate_stream: a text file for CSV, a row-group-per-chunk sink for Parquet."""
+    if out_format == "parquet":
+        import columnar
+        return columnar.ParquetSink(path)
+    return open(path, 'w', encoding='utf-8', newline='')
+
+def segregate_stream(input_file, safe_file, violated_file, chunksize, workers=1,
+                     cache_size=0, cache_db=None, classify_only=False, out_format="csv", near_dup=None):
+    """
+    Streaming mode: reads input_file chunksize rows at a time, scores each chunk and
+    appends it straight to the safe and violated outputs, so memory stays bounded by
+    the chunk size rather than the input size.
+    With workers > 1 chunks are scored in a process pool (at most 2 * workers in flight)
+    and written back in input order, so the output matches a serial run byte for byte.
+    Each process keeps its own LRU score cache of cache_size entries; cache_db adds a
+    shared SQLite tier. classify_only writes just the 'violated' column (the cache is not used).
+    out_format="parquet" writes typed Parquet files (see columnar.py), one row group per chunk.
+    near_dup clusters near-duplicates within each chunk (see segregate).
+    Returns (safe_count, violated_count), or None if the input is unusable.
+    """
+    try:
+        reader = pd.read_csv(input_file, chunksize=chunksize, **READ_OPTIONS)
+    except FileNotFoundError:
+        print(f"Error: {input_file} not found.")
+        return None
+
+    if classify_only:
+        cache_size, cache_db = 0, None
+    if workers > 1:
+        # Load (or build) the matcher before forking so workers inherit it
+        # instead of each loading the KB artifact or compiling from source.
+        get_bias_matcher()
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(cache_size, cache_db, metrics.mode()))
+    else:
+        pool = None
+        _init_worker(cache_size, cache_db)
+    pending = deque()
+    counts = {"rows": 0, "safe": 0, "violated": 0, "chunks": 0}
+    cache_stats = {}
+    start = time.perf_counter()
+
+    def write(result):
+        rows, safe_rows, violated_rows, safe_csv, violated_csv, (pid, stats, snapshot) = result
+        if stats is not None:
+            cache_stats[pid] = stats
+        if snapshot is not None:
+            metrics.merge(snapshot)
+        with metrics.stage("write_" + out_format):
+            safe_out.write(safe_csv)
+            violated_out.write(violated_csv)
+        counts["chunks"] += 1
+        counts["rows"] += rows
+        counts["safe"] += safe_rows
+        counts["violated"] += violated_rows
+        elapsed = time.perf_counter() - start
+        rate = counts["rows"] / elapsed if elapsed > 0 else float('inf')
+        if metrics.ENABLED:
+            metrics.set_gauge("rows_per_second", rate)
+            metrics.set_gauge("queue_depth", len(pending), queue="chunks_in_flight")
+        print(f"Chunk {counts['chunks']}: {rows} tweets ({safe_rows} safe, {violated_rows} violated), "
+              f"{rate:.0f} tweets/s overall")
+
+    try:
+        with reader, _open_output(safe_file, out_format) as safe_out, \
+                _open_output(violated_file, out_format) as violated_out:
+            for i, chunk in enumerate(_timed(reader, "read_csv")):
+                if 'full_text' not in chunk.columns:
+                    print("Error: 'full_text' column not found in CSV.")
+                    return None
+
+                if pool is None:
+                    write(_score_chunk(i, chunk, classify_only=classify_only, out_format=out_format,
+                                       near_dup=near_dup))
+                    continue
+
+                # One cdist thread per process; the pool provides the parallelism
+                pending.append(pool.submit(_score_chunk, i, chunk, 1, classify_only, out_format, near_dup))
+                while len(pending) > 2 * workers:
+                    write(pending.popleft().result())
+
+            while pending:
+                write(pending.popleft().result())
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    total = counts["rows"]
+    elapsed = time.perf_counter() - start
+    if total:
+        print(f"Overall: {total} tweets in {elapsed:.2f}s, {total / elapsed:.0f} tweets/s")
+    if cache_stats:
+        # Sum the latest counters reported by each process
+        print_cache_stats({name: sum(s[name] for s in cache_stats.values())
+                           for name in ("hits", "disk_hits", "misses", "evictions")})
+    return counts["safe"], counts["violated"]
+
+def _read_range(input_file, start, end, header_end, row_start=0):
+    """DataFrame of the records in bytes [start, end) of input_file, indexed from row_start
+    (the input row number of its first record, so 'cluster_id' matches the other modes)."""
+    with open(input_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        data = mm[:header_end] + mm[start:end]
+    chunk = pd.read_csv(io.BytesIO(data), **READ_OPTIONS)
+    chunk.index = pd.RangeIndex(row_start, row_start + len(chunk))
+    return chunk
+
+def _count_range(input_file, start, end, header_end):
+    """Number of records in bytes [start, end) of input_file, as _read_range parses them."""
+    return len(_read_range(input_file, start, end, header_end))
+
+def _score_range(input_file, index, start, end, header_end, parts, workers=-1, classify_only=False,
+                 out_format="csv", near_dup=None, row_start=0):
+    """
+    Checkpointed-mode task: parses one byte range, scores it and writes both halves to
+    their part files durably. Returns _score_chunk's result without the rendered outputs.
+    """
+    with metrics.stage("read_csv"):
+        chunk = _read_range(input_file, start, end, header_end, row_start)
+    result = _score_chunk(index, chunk, workers, classify_only, out_format, near_dup)
+    for path, out in zip(parts, result[3:5]):
+        checkpoint.write_part(path, out)
+    return result[:3] + result[5:]
+
+def segregate_checkpointed(input_file, safe_file, violated_file, checkpoint_dir=None,
+                           chunk_bytes=checkpoint.CHUNK_BYTES, workers=1, cache_size=0, cache_db=None,
+                           classify_only=False, out_format="csv", near_dup=None):
+    """
+    Resumable mode: memory-maps input_file, splits it into record-aligned byte ranges of
+    about chunk_bytes (checkpoint.split_ranges; no upfront parse) and scores them, in a
+    process pool when workers > 1. Each finished chunk's outputs go to part files in
+    checkpoint_dir (default: "<safe_file>.parts") and are recorded in its manifest, so a
+    rerun after a crash skips them. Once every chunk is done the parts are merged, in input
+    order, into safe_file and violated_file and the checkpoint is removed.
+    near_dup clusters within each chunk; 'cluster_id' is the input row number, as in
+    the other modes, so the chunks still to score are counted (parsed) first.
+    Other arguments as for segregate_stream.
+    Returns (safe_count, violated_count), or None if the input is unusable.
+    """
+    try:
+        f = open(input_file, 'rb')
+    except FileNotFoundError:
+        print(f"Error: {input_file} not found.")
+        return None
+    with f:
+        if os.fstat(f.fileno()).st_size == 0:
+            print(f"Error: {input_file} is empty.")
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header_end = checkpoint.header_end(mm)
+            columns = pd.read_csv(io.BytesIO(mm[:header_end]), sep='|', nrows=0).columns
+            if 'full_text' not in columns:
+                print("Error: 'full_text' column not found in CSV.")
+                return None
+            with metrics.stage("split_ranges"):
+                ranges = checkpoint.split_ranges(mm, chunk_bytes, header_end)
+
+    if classify_only:
+        cache_size, cache_db, near_dup = 0, None, None
+    key = checkpoint.input_key(input_file, chunk_bytes, out_format=out_format, classify_only=classify_only,
+                               near_dup=near_dup, kb_version=get_bias_matcher().version)
+    manifest = checkpoint.Manifest(checkpoint_dir or f"{safe_file}.parts", key)
+    names = ("safe", "violated")
+    parts = [tuple(manifest.part_path(i, name, out_format) for name in names) for i in range(len(ranges))]
+    todo = [i for i in range(len(ranges)) if not manifest.is_done(i, names, out_format)]
+    if len(todo) < len(ranges):
+        print(f"♻️  Resuming: {len(ranges) - len(todo)}/{len(ranges)} chunks already done in {manifest.directory}")
+
+    if workers > 1 and len(todo) > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(cache_size, cache_db, metrics.mode()))
+    else:
+        pool = None
+        _init_worker(cache_size, cache_db)
+    # Row number of each chunk's first record: only 'cluster_id' shows it, so it is worked
+    # out (finished chunks from the manifest, the rest by parsing them) only for near_dup
+    row_starts = [0] * len(ranges)
+    if near_dup:
+        rows = {i: entry["rows"] for i, entry in manifest.done.items()}
+        count = [i for i in todo if i + 1 < len(ranges)]  # the last chunk's count isn't needed
+        with metrics.stage("count_rows"):
+            counted = (pool.map if pool is not None else map)(
+                _count_range, [input_file] * len(count), [ranges[i][0] for i in count],
+                [ranges[i][1] for i in count], [header_end] * len(count))
+            rows.update(zip(count, counted))
+        for i in range(1, len(ranges)):
+            row_starts[i] = row_starts[i - 1] + rows[i - 1]
+    cache_stats = {}
+    start = time.perf_counter()
+    rows_done = 0
+
+    def finish(i, result):
+        nonlocal rows_done
+        rows, safe_rows, violated_rows, (pid, stats, snapshot) = result
+        if stats is not None:
+            cache_stats[pid] = stats
+        if snapshot is not None:
+            metrics.merge(snapshot)
+        manifest.record({"chunk": i, "start": ranges[i][0], "end": ranges[i][1],
+                         "rows": rows, "safe": safe_rows, "violated": violated_rows})
+        rows_done += rows
+        elapsed = time.perf_counter() - start
+        rate = rows_done / elapsed if elapsed > 0 else float('inf')
+        if metrics.ENABLED:
+            metrics.set_gauge("rows_per_second", rate)
+        print(f"Chunk {i + 1}/{len(ranges)}: {rows} tweets ({safe_rows} safe, {violated_rows} violated), "
+              f"{rate:.0f} tweets/s overall")
+
+    try:
+        if pool is None:
+            for i in todo:
+                finish(i, _score_range(input_file, i, *ranges[i], header_end, parts[i],
+                                       classify_only=classify_only, out_format=out_format, near_dup=near_dup,
+                                       row_start=row_starts[i]))
+        else:
+            # One cdist thread per process; at most 2 * workers chunks in flight
+            pending = {}
+            for i in todo:
+                future = pool.submit(_score_range, input_file, i, *ranges[i], header_end, parts[i], 1,
+                                     classify_only, out_format, near_dup, row_starts[i])
+                pending[future] = i
+                while len(pending) >= 2 * workers:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        finish(pending.pop(future), future.result())
+            for future in list(pending):
+                finish(pending.pop(future), future.result())
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    with metrics.stage("merge_" + out_format):
+        for k, path in enumerate((safe_file, violated_file)):
+            checkpoint.merge_parts([p[k] for p in parts], path, out_format)
+    done = [manifest.done[i] for i in range(len(ranges))]
+    manifest.remove()
+
+    elapsed = time.perf_counter() - start
+    if rows_done:
+        print(f"Overall: {rows_done} tweets in {elapsed:.2f}s, {rows_done / elapsed:.0f} tweets/s")
+    if cache_stats:
+        print_cache_stats({name: sum(s[name] for s in cache_stats.values())
+                           for name in ("hits", "disk_hits", "misses", "evictions")})
+    return sum(d["safe"] for d in done), sum(d["violated"] for d in done)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Split a tweet dump into safe and violated CSVs (or Parquet files).")
+    parser.add_argument("--input", default='11th_hour_political_tweets.csv',
+                        help="pipe-delimited input CSV with a 'full_text' column")
+    parser.add_argument("--safe-output", default=None, help="default: segregated_safe.csv (or .parquet)")
+    parser.add_argument("--violated-output", default=None, help="default: segregated_violated.csv (or .parquet)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv",
+                        help="parquet: typed columns, list-of-struct bias_matches (needs pyarrow)")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="stream the input this many rows at a time (no checkpoints)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="score chunks in this many processes")
+    parser.add_argument("--checkpoint-dir", default=None,
+                        help="per-chunk outputs and manifest for resuming (default: <safe output>.parts)")
+    parser.add_argument("--chunk-bytes", type=int, default=checkpoint.CHUNK_BYTES,
+                        help="input bytes per checkpointed chunk")
+    parser.add_argument("--no-checkpoint", action="store_true",
+                        help="load the input whole and write the outputs at the end (or stream with --workers)")
+    parser.add_argument("--classify-only", action="store_true",
+                        help="only decide safe/violated (adds just a 'violated' column); faster")
+    parser.add_argument("--cache-size", type=int, default=100000,
+                        help="in-memory score cache entries per process (0 disables)")
+    parser.add_argument("--cache-db", default=None,
+                        help="SQLite file for a persistent score cache shared across runs")
+    parser.add_argument("--near-dup", type=float, nargs="?", const=0.7, default=None, metavar="THRESHOLD",
+                        help="score one tweet per near-duplicate cluster (shingle Jaccard >= THRESHOLD, "
+                             "default 0.7) and add a 'cluster_id' column; ignored with --classify-only")
+    parser.add_argument("--metrics", default=None,
+                        help="record stage timings and counters and write them here (.prom = Prometheus text, else JSON)")
+    parser.add_argument("--profile", action="store_true",
+                        help="with --metrics, also time every fuzzy comparison per KB term and print the costliest terms")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.metrics or args.profile:
+        metrics.enable(profile=args.profile)
+    try:
+        _run(args)
+    finally:
+        if args.profile:
+            print("Costliest KB terms (fuzzy time):")
+            for term, lang, seconds, calls in metrics.top_terms(10):
+                print(f"   {term} ({lang}): {seconds * 1000:.1f}ms over {calls} comparisons")
+        if args.metrics:
+            metrics.dump(args.metrics)
+            print(f"Metrics saved to {args.metrics}")
+
+def _run(args):
+    input_file = args.input
+    suffix = "parquet" if args.format == "parquet" else "csv"
+    safe_file = args.safe_output or f'segregated_safe.{suffix}'
+    violated_file = args.violated_output or f'segregated_violated.{suffix}'
+    if args.format == "parquet":
+        import columnar
+        columnar.require_pyarrow()
+
+    if not args.chunksize and not args.no_checkpoint:
+        print(f"Processing {input_file} in checkpointed chunks of {args.chunk_bytes} bytes "
+              f"with {args.workers} worker(s)...")
+        counts = segregate_checkpointed(input_file, safe_file, violated_file, args.checkpoint_dir,
+                                        args.chunk_bytes, workers=args.workers, cache_size=args.cache_size,
+                                        cache_db=args.cache_db, classify_only=args.classify_only,
+                                        out_format=args.format, near_dup=args.near_dup)
+        if counts is None:
+            return
+        print(f"Processing complete.")
+        print(f"Safe tweets: {counts[0]} saved to {safe_file}")
+        print(f"Violated tweets: {counts[1]} saved to {violated_file}")
+        return
+
+    if args.chunksize or args.workers > 1:
+        chunksize = args.chunksize or DEFAULT_CHUNKSIZE
+        print(f"Streaming {input_file} in chunks of {chunksize} rows with {args.workers} worker(s)...")
+        counts = segregate_stream(input_file, safe_file, violated_file, chunksize, workers=args.workers,
+                                  cache_size=args.cache_size, cache_db=args.cache_db,
+                                  classify_only=args.classify_only, out_format=args.format,
+                                  near_dup=args.near_dup)
+        if counts is None:
+            return
+        print(f"Processing complete.")
+        print(f"Safe tweets: {counts[0]} saved to {safe_file}")
+        print(f"Violated tweets: {counts[1]} saved to {violated_file}")
+        return
+
     print(f"Reading {input_file}...")
     try:
-        df = pd.read_csv(input_file, sep='|')
+        with metrics.stage("read_csv"):
+            df = pd.read_csv(input_file, **READ_OPTIONS)
     except FileNotFoundError:
         print(f"Error: {input_file} not found.")
         return
@@ -44,25 +522,27 @@ def main():
         return
 
     print("Processing tweets...")
-    # Apply evaluation
-    results = df['full_text'].apply(evaluate_tweet)
-    
-    # Expand results into columns
-    results_df = pd.DataFrame(results.tolist())
-    
-    # Concatenate with original dataframe
-    df_processed = pd.concat([df, results_df], axis=1)
-    
-    # Segregate
-    safe_tweets = df_processed[~df_processed['violated']]
-    violated_tweets = df_processed[df_processed['violated']]
-    
+    cache = None
+    if not args.classify_only and (args.cache_size > 0 or args.cache_db):
+        cache = ScoreCache(args.cache_size, args.cache_db)
+    safe_tweets, violated_tweets = segregate(df, cache=cache, classify_only=args.classify_only,
+                                             raw_matches=args.format == "parquet", near_dup=args.near_dup)
+    if args.near_dup and not args.classify_only:
+        clusters = pd.concat([safe_tweets["cluster_id"], violated_tweets["cluster_id"]])
+        print(f"🧬 {len(clusters)} tweets in {clusters.nunique()} near-duplicate clusters")
+    if cache is not None:
+        print_cache_stats(cache.stats())
+        cache.close()
+
     # Save
-    safe_file = 'segregated_safe.csv'
-    violated_file = 'segregated_violated.csv'
-    
-    safe_tweets.to_csv(safe_file, index=False)
-    violated_tweets.to_csv(violated_file, index=False)
+    with metrics.stage("write_" + args.format):
+        if args.format == "parquet":
+            for frame, path in ((safe_tweets, safe_file), (violated_tweets, violated_file)):
+                with columnar.ParquetSink(path) as sink:
+                    sink.write(columnar.to_table(frame))
+        else:
+            safe_tweets.to_csv(safe_file, index=False)
+            violated_tweets.to_csv(violated_file, index=False)
     
     print(f"Processing complete.")
     print(f"Safe tweets: {len(safe_tweets)} saved to {safe_file}")
@@ -0,0 +1,82 @@
+"""
+Checkpointed segregation: record-aligned byte ranges, crash/resume, and
+output identical to a whole-file run.
+
+    python -m pytest -q test_checkpoint.py
+"""
+
+import io
+import mmap
+import random
+
+import pandas as pd
+import pytest
+
+import checkpoint
+import segregate_tweets
+
+WORDS = ["dalit", "brahmin", "village", "rally", "people", "lazy", "jobs", "the", "said", "muslim", "policy"]
+
+
+def write_dump(path, n=400, seed=0):
+    """Pipe-delimited dump with quoted newlines, pipes and quotes, an int column
+    with blanks and a column that turns into text late in the file."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        text = " ".join(rng.choices(WORDS, k=rng.randint(3, 10)))
+        if rng.random() < 0.2:
+            text = text.replace(" ", "\n", 1)
+        elif rng.random() < 0.2:
+            text = f'he said "{text}" | ok'
+        likes = str(rng.randrange(100)) if i < n // 2 else rng.choice(["1.2k", "17", ""])
+        retweets = rng.choice(["", str(rng.randrange(9))])
+        rows.append({"id": i, "full_text": text, "likes": likes, "retweets": retweets})
+    pd.DataFrame(rows).to_csv(path, sep="|", index=False)
+
+
+def test_split_ranges_align_to_records(tmp_path):
+    path = tmp_path / "dump.csv"
+    write_dump(path)
+    whole = pd.read_csv(path, **segregate_tweets.READ_OPTIONS)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = checkpoint.header_end(mm)
+        ranges = checkpoint.split_ranges(mm, 700, start)
+        assert len(ranges) > 10
+        assert ranges[0][0] == start and ranges[-1][1] == len(mm)
+        assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+        parts = [pd.read_csv(io.BytesIO(mm[:start] + mm[s:e]), **segregate_tweets.READ_OPTIONS) for s, e in ranges]
+    pd.testing.assert_frame_equal(pd.concat(parts, ignore_index=True), whole)
+
+
+def test_resume_after_crash_matches_whole_file_run(tmp_path, monkeypatch):
+    path = tmp_path / "dump.csv"
+    write_dump(path)
+    out = {name: str(tmp_path / f"{name}.csv") for name in ("safe", "violated", "safe_ref", "violated_ref")}
+    segregate_tweets.main(["--input", str(path), "--no-checkpoint", "--cache-size", "0",
+                           "--safe-output", out["safe_ref"], "--violated-output", out["violated_ref"]])
+
+    score_range = segregate_tweets._score_range
+    calls = []
+
+    def crash_on_fourth(*args, **kwargs):
+        calls.append(args[1])
+        if len(calls) == 4:
+            raise KeyboardInterrupt("simulated crash")
+        return score_range(*args, **kwargs)
+
+    monkeypatch.setattr(segregate_tweets, "_score_range", crash_on_fourth)
+    kwargs = dict(checkpoint_dir=str(tmp_path / "parts"), chunk_bytes=2000)
+    with pytest.raises(KeyboardInterrupt):
+        segregate_tweets.segregate_checkpointed(str(path), out["safe"], out["violated"], **kwargs)
+    resumed = []
+    monkeypatch.setattr(segregate_tweets, "_score_range",
+                        lambda *a, **k: resumed.append(a[1]) or score_range(*a, **k))
+    counts = segregate_tweets.segregate_checkpointed(str(path), out["safe"], out["violated"], **kwargs)
+
+    assert resumed and min(resumed) == 3  # chunks 0-2 were taken from the checkpoint
+    for name in ("safe", "violated"):
+        with open(out[name], "rb") as got, open(out[name + "_ref"], "rb") as want:
+            assert got.read() == want.read()
+    assert counts == (len(pd.read_csv(out["safe_ref"])), len(pd.read_csv(out["violated_ref"])))
+    assert not (tmp_path / "parts").exists()
@@ -0,0 +1,104 @@
+"""
+Equivalence checks for BiasMatcher: every fast path (Aho-Corasick prefilter,
+q-gram count filter, batched cpdist, early-exit classify, delta updates) must
+give exactly the match sets of the original linear scan over the KB.
+
+    python -m pytest -q test_matcher.py
+"""
+
+import random
+
+from rapidfuzz import fuzz
+
+import costitu2
+
+FILLER = ["the", "people", "of", "village", "today", "rally", "government", "said", "new", "policy",
+          "https://t.co/x7", "@user42", "#vote", "with", "and", "jobs"]
+
+
+def linear_scan(text, kb, latin_to_native, threshold=costitu2.FUZZ_THRESHOLD):
+    """The original detect_bias_terms: every Latin key and KB term against the text."""
+    text_low = text.lower()
+    matches = set()
+    for eng_key, native_map in latin_to_native.items():
+        key = eng_key.lower()
+        if fuzz.partial_ratio(key, text_low) >= threshold or key in text_low:
+            for lang, native_term in native_map.items():
+                for kb_term in kb.get(lang, []):
+                    if (fuzz.partial_ratio(native_term, kb_term) >= threshold
+                            or native_term in kb_term or kb_term in native_term):
+                        matches.add((kb_term, lang))
+            for kb_eng in kb.get("english", []):
+                if fuzz.partial_ratio(key, kb_eng) >= threshold or key in kb_eng:
+                    matches.add((kb_eng, "english"))
+    for lang, terms in kb.items():
+        for term in terms:
+            if fuzz.partial_ratio(term.lower(), text_low) >= threshold or term.lower() in text_low:
+                matches.add((term, lang))
+    return matches
+
+
+def _mutate(word, rng):
+    """A near miss of `word`: one character dropped, doubled or swapped."""
+    if len(word) < 3:
+        return word
+    i = rng.randrange(len(word) - 1)
+    return rng.choice([word[:i] + word[i + 1:], word[:i] + word[i] + word[i:],
+                       word[:i] + word[i + 1] + word[i] + word[i + 2:]])
+
+
+def make_texts(n, kb, latin_to_native, seed=0):
+    rng = random.Random(seed)
+    terms = [t for ts in kb.values() for t in ts] + list(latin_to_native)
+    texts = []
+    for _ in range(n):
+        words = rng.choices(FILLER, k=rng.randint(3, 12))
+        for _ in range(rng.randint(0, 3)):
+            term = rng.choice(terms)
+            words.insert(rng.randrange(len(words) + 1), _mutate(term, rng) if rng.random() < 0.5 else term)
+        text = " ".join(words)
+        texts.append(text.upper() if rng.random() < 0.1 else text)
+    return texts
+
+
+def test_match_and_match_batch_equal_linear_scan():
+    kb, latin = costitu2.KNOWLEDGE_BASE, costitu2.LATIN_TO_NATIVE
+    matcher = costitu2.BiasMatcher(kb, latin)
+    texts = make_texts(150, kb, latin, seed=1)
+    expected = [linear_scan(t, kb, latin) for t in texts]
+    assert [matcher.match(t) for t in texts] == expected
+    assert matcher.match_batch(texts, workers=1, batch_size=64) == expected
+
+
+def test_texts_no_longer_than_a_probe_equal_linear_scan():
+    # at equal lengths partial_ratio also aligns the text inside the probe ("tod" vs "tdp")
+    kb, latin = costitu2.KNOWLEDGE_BASE, costitu2.LATIN_TO_NATIVE
+    matcher = costitu2.BiasMatcher(kb, latin)
+    texts = ["tod", "pri"] + [t[:k] for t in make_texts(60, kb, latin, seed=3) for k in (3, 4, 6)]
+    expected = [linear_scan(t, kb, latin) for t in texts]
+    assert [matcher.match(t) for t in texts] == expected
+    assert matcher.match_batch(texts, workers=1) == expected
+
+
+def test_classify_text_equals_linear_verdict():
+    kb, latin = costitu2.KNOWLEDGE_BASE, costitu2.LATIN_TO_NATIVE
+    matcher = costitu2.BiasMatcher(kb, latin)
+    texts = make_texts(150, kb, latin, seed=2) + ["they are lazy and stupid"]
+    for text in texts:
+        expected = len(linear_scan(text, kb, latin)) > 1 or costitu2.toxicity_score(text) > 0.2
+        assert costitu2.classify_text(text, matcher) == expected, text
+
+
+def test_updated_equals_linear_scan_on_new_kb():
+    kb, latin = costitu2.KNOWLEDGE_BASE, costitu2.LATIN_TO_NATIVE
+    base = costitu2.BiasMatcher(kb, latin)
+    rng = random.Random(3)
+    for round_ in range(3):
+        new_kb = {lang: [t for t in terms if rng.random() > 0.1] for lang, terms in kb.items()}
+        new_kb["english"] = new_kb["english"] + [f"newterm{round_}", "village council"]
+        new_latin = {k: v for k, v in latin.items() if rng.random() > 0.1}
+        new_latin[f"newkey{round_}"] = {"english": f"newterm{round_}", "hindi": rng.choice(kb["hindi"])}
+        matcher = base.updated(new_kb, new_latin)
+        texts = make_texts(60, new_kb, new_latin, seed=10 + round_)
+        assert matcher.match_batch(texts, workers=1) == [linear_scan(t, new_kb, new_latin) for t in texts]
+        base = matcher
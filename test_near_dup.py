@@ -0,0 +1,95 @@
+"""
+score_clustered must give exactly score_batch's bias matches: members only
+inherit their representative's matches when every changed region provably
+can't change them. On a templated campaign it must also score at most half
+the rows in full and take less time than score_batch.
+
+    python -m pytest -q test_near_dup.py
+"""
+
+import random
+import time
+
+import costitu2
+import near_dup
+from test_matcher import make_texts
+
+
+def _variants(n, seed):
+    rng = random.Random(seed)
+    kb, latin = costitu2.KNOWLEDGE_BASE, costitu2.LATIN_TO_NATIVE
+    bases = [" ".join(make_texts(3, kb, latin, seed=seed * 100 + k)) for k in range(20)]
+    bases += make_texts(20, kb, latin, seed=seed)  # short texts too
+    texts = []
+    for _ in range(n):
+        words = rng.choice(bases).split()
+        for _ in range(rng.randint(1, 3)):
+            pos = rng.randrange(len(words))
+            op = rng.random()
+            if op < 0.6:
+                words.insert(pos, rng.choice([f"http://t.co/{rng.getrandbits(40):x}", f"@user{rng.randrange(10**6)}",
+                                              "bs", "p"]))
+            elif op < 0.8 and pos + 1 < len(words):
+                words[pos], words[pos + 1] = words[pos + 1], words[pos]
+            else:
+                del words[pos]
+        texts.append(" ".join(words))
+    return texts
+
+
+def _campaign(n, seed):
+    """80% template tweets with 1-3 handles, URLs or hashtags inserted; the rest one-offs."""
+    rng = random.Random(seed)
+    kb, latin = costitu2.KNOWLEDGE_BASE, costitu2.LATIN_TO_NATIVE
+    templates = [t for t in make_texts(250, kb, latin, seed=seed + 1000) if len(t.split()) >= 5]
+    singles = make_texts(n, kb, latin, seed=seed + 7)
+    texts = []
+    for k in range(n):
+        if rng.random() < 0.8:
+            words = rng.choice(templates).split()
+            for _ in range(rng.randint(1, 3)):
+                words.insert(rng.randrange(len(words) + 1),
+                             rng.choice([f"@user{rng.randrange(10**6)}", f"https://t.co/{rng.getrandbits(40):x}",
+                                         f"#{rng.choice(['vote', 'rally', 'jobs'])}{rng.randrange(100)}"]))
+            texts.append(" ".join(words))
+        else:
+            texts.append(singles[k])
+    return texts
+
+
+def test_changed_regions_count_moved_tokens():
+    regions = near_dup.changed_regions("a b c d", "a c b d")
+    assert regions and all(m != (0, 0) for m, _ in regions)
+    assert near_dup.changed_regions("same text", "same text") == []
+    assert near_dup.changed_regions("a @x b", "a b") == [((1, 4), (1, 1))]
+
+
+def test_score_clustered_equals_score_batch():
+    matcher = costitu2.get_bias_matcher()
+    for seed in (1, 2):
+        texts = _variants(400, seed)
+        clustered = near_dup.score_clustered(texts, matcher, workers=1)
+        full = costitu2.score_batch(texts, matcher, workers=1)
+        assert clustered["scored"] < len(texts)
+        assert clustered["bias_matches"] == full["bias_matches"]
+        assert clustered["toxicity"] == full["toxicity"]
+
+
+def test_campaign_scores_at_most_half_and_is_faster():
+    matcher = costitu2.get_bias_matcher()
+    texts = _campaign(3000, seed=0)
+    costitu2.score_batch(texts[:50], matcher, workers=1)  # warm up
+
+    def best_of(run, repeat=3):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = run()
+            times.append(time.perf_counter() - start)
+        return result, min(times)
+
+    full, full_seconds = best_of(lambda: costitu2.score_batch(texts, matcher, workers=1))
+    clustered, clustered_seconds = best_of(lambda: near_dup.score_clustered(texts, matcher, workers=1))
+    assert clustered["bias_matches"] == full["bias_matches"]
+    assert clustered["scored"] <= len(texts) // 2
+    assert clustered_seconds < full_seconds
@@ -0,0 +1,100 @@
+"""
+score_service.py over real sockets (serve(port=0)): scoring, 400 on a
+malformed Content-Length, 413 for requests that can never fit, 503 when the
+queue is full.
+
+    python -m pytest -q test_score_service.py
+"""
+
+import asyncio
+import json
+import threading
+
+import costitu2
+import score_service
+
+
+class GatedCache:
+    """Stands in for a ScoreCache; holds every batch until `gate` is set."""
+
+    def __init__(self, matcher):
+        self.matcher = matcher
+        self.max_entries = 0
+        self.gate = threading.Event()
+
+    def score_many(self, texts, workers=1):
+        self.gate.wait(10)
+        return costitu2.score_batch(texts, self.matcher, workers=workers)
+
+
+async def request(port, raw):
+    """Send raw request bytes; returns (status, decoded JSON body, connection header)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(raw)
+        await writer.drain()
+        head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        headers = dict(line.lower().split(": ", 1) for line in head[1:] if line)
+        body = await reader.readexactly(int(headers["content-length"]))
+        return int(head[0].split(" ")[1]), json.loads(body), headers["connection"]
+    finally:
+        writer.close()
+
+
+def post(port, payload):
+    body = json.dumps(payload).encode("utf-8")
+    return request(port, b"POST /score HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+
+
+def run_with_service(check, **batcher_kwargs):
+    async def main():
+        loop = asyncio.get_running_loop()
+        bound = loop.create_future()
+        server = asyncio.ensure_future(score_service.serve("127.0.0.1", 0, ready=bound.set_result, **batcher_kwargs))
+        _, port = await bound
+        try:
+            await check(port)
+        finally:
+            server.cancel()
+            try:
+                await server
+            except asyncio.CancelledError:
+                pass
+    asyncio.run(main())
+
+
+def test_score_and_malformed_content_length():
+    matcher = costitu2.get_bias_matcher()
+
+    async def check(port):
+        status, body, _ = await post(port, {"texts": ["Some people are just lazy and stupid", "hello"]})
+        assert status == 200
+        assert [r["violated"] for r in body["results"]] == [True, False]
+        for length in (b"abc", b"-5"):
+            status, body, connection = await request(
+                port, b"POST /score HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n{}")
+            assert (status, connection) == (400, "close")
+        status, _, _ = await post(port, {"txt": "x"})
+        assert status == 400
+
+    run_with_service(check, matcher=matcher)
+
+
+def test_overload_gets_503_and_oversized_request_413():
+    matcher = costitu2.get_bias_matcher()
+    cache = GatedCache(matcher)
+
+    async def check(port):
+        status, body, _ = await post(port, {"texts": ["x"] * 5})
+        assert status == 413 and "at most 4" in body["error"]
+        held = asyncio.ensure_future(post(port, {"texts": ["a", "b", "c"]}))
+        await asyncio.sleep(0.2)  # the scorer now holds 3 of the 4 queue slots
+        status, _, _ = await post(port, {"texts": ["d", "e"]})
+        assert status == 503
+        cache.gate.set()
+        status, body, _ = await held
+        assert status == 200 and len(body["results"]) == 3
+        status, _, _ = await post(port, {"texts": ["d", "e"]})
+        assert status == 200
+
+    run_with_service(check, matcher=matcher, max_queue=4, cache=cache)
@@ -0,0 +1,90 @@
+"""
+segregate_tweets.py read modes (whole file, checkpointed, streamed; serial and
+pooled) must agree row for row, including blank text and near-dup cluster ids.
+
+    python -m pytest -q test_segregate_tweets.py
+"""
+
+import random
+
+import pandas as pd
+import pytest
+
+import segregate_tweets
+from test_checkpoint import WORDS, write_dump
+
+MODES = {
+    "whole": ["--no-checkpoint"],
+    "checkpoint": ["--chunk-bytes", "2000"],
+    "checkpoint_pool": ["--chunk-bytes", "2000", "--workers", "2"],
+    "stream": ["--chunksize", "37"],
+    "stream_pool": ["--chunksize", "37", "--workers", "2"],
+}
+
+
+def run_modes(tmp_path, path, *extra, modes=MODES):
+    """{mode: (safe bytes, violated bytes)} for every read mode."""
+    outputs = {}
+    for mode, args in modes.items():
+        safe, violated = tmp_path / f"{mode}.safe.csv", tmp_path / f"{mode}.violated.csv"
+        segregate_tweets.main(["--input", str(path), "--cache-size", "0", *args, *extra,
+                               "--safe-output", str(safe), "--violated-output", str(violated)])
+        outputs[mode] = (safe.read_bytes(), violated.read_bytes())
+    return outputs
+
+
+@pytest.fixture
+def dump_with_blank_text(tmp_path):
+    path = tmp_path / "dump.csv"
+    write_dump(path, n=200)
+    lines = path.read_text(encoding="utf-8").splitlines(keepends=True)
+    # an empty quoted field, an empty field and a row cut off before full_text
+    lines[1:1] = ['9001|""|3|1\n', "9002||4|\n", "9003\n"]
+    middle = next(i for i in range(len(lines) // 2, len(lines)) if "".join(lines[:i]).count('"') % 2 == 0)
+    lines.insert(middle, "9004||5|2\n")
+    path.write_text("".join(lines), encoding="utf-8")
+    return path
+
+
+def test_blank_text_is_safe_in_every_mode(tmp_path, dump_with_blank_text):
+    outputs = run_modes(tmp_path, dump_with_blank_text)
+    assert len(set(outputs.values())) == 1
+    safe = pd.read_csv(tmp_path / "whole.safe.csv", keep_default_na=False, dtype=str)
+    violated = pd.read_csv(tmp_path / "whole.violated.csv", keep_default_na=False, dtype=str)
+    blank = safe[safe["id"].isin(["9001", "9002", "9003", "9004"])]
+    assert sorted(blank["id"]) == ["9001", "9002", "9003", "9004"]
+    assert (blank["full_text"] == "").all() and (blank["bias_count"] == "0").all()
+    assert not violated["id"].str.startswith("900").any()
+
+
+def write_campaign_dump(path, n=300, seed=0):
+    """Templated tweets that differ by handle / URL; `id` is the row number."""
+    rng = random.Random(seed)
+    templates = [" ".join(rng.choices(WORDS, k=12)) for _ in range(8)]
+    rows = [{"id": i, "full_text": f"{rng.choice(templates)} @user{rng.randrange(10**6)} "
+                                  f"https://t.co/{rng.getrandbits(32):x}"} for i in range(n)]
+    pd.DataFrame(rows).to_csv(path, sep="|", index=False)
+
+
+def read_outputs(tmp_path, mode):
+    frames = [pd.read_csv(tmp_path / f"{mode}.{name}.csv") for name in ("safe", "violated")]
+    return pd.concat(frames).set_index("id").sort_index()
+
+
+def test_cluster_id_is_the_representatives_row_number_in_every_mode(tmp_path):
+    path = tmp_path / "campaign.csv"
+    write_campaign_dump(path)
+    # one chunk: every mode clusters the same rows, so the outputs are identical
+    one_chunk = {mode: [a if a not in ("2000", "37") else "1000000" for a in args] for mode, args in MODES.items()}
+    outputs = run_modes(tmp_path, path, "--near-dup", modes=one_chunk)
+    assert len(set(outputs.values())) == 1
+    assert read_outputs(tmp_path, "whole")["cluster_id"].nunique() <= 8
+
+    # small chunks: clusters are per chunk, but ids still name input rows
+    run_modes(tmp_path, path, "--near-dup")
+    for mode in MODES:
+        clusters = read_outputs(tmp_path, mode)["cluster_id"]
+        assert len(clusters) == 300
+        assert (clusters <= clusters.index).all(), mode
+        assert (clusters.loc[clusters.unique()] == clusters.unique()).all(), mode
+        assert clusters.nunique() < 150, mode
@@ -0,0 +1,70 @@
+"""
+Ingest pipeline against the local stub (twitter_stub.py): pagination past one
+page, since_id resume, 429 backoff and 4xx errors.
+
+    python -m pytest -q test_twitter_ingest.py
+"""
+
+import asyncio
+import urllib.error
+
+import pytest
+
+import twitter_ingest
+import twitter_stub
+
+
+def matching_ids(state, query, since_id=0):
+    words = query.lower().split()
+    return {t["id"] for t in state.tweets
+            if int(t["id"]) > since_id and all(w in t["text"].lower() for w in words)}
+
+
+def collect(client, query, **kwargs):
+    async def run():
+        return [t async for t in twitter_ingest.paginate(client, query, **kwargs)]
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def stub():
+    server, url = twitter_stub.start_in_thread(n_tweets=450)
+    yield server, url
+    server.shutdown()
+    server.server_close()
+
+
+def test_ingest_follows_pagination_and_resumes_from_since_id(stub):
+    server, url = stub
+    expected = matching_ids(server.state, "the")
+    assert len(expected) > twitter_ingest.PAGE_SIZE
+    rows = twitter_ingest.run_ingest("the", base_url=url, bearer_token="test", batch_size=40)
+    assert sorted(r["tweet_id"] for r in rows) == sorted(expected)
+    assert server.state.hits["/2/tweets/search/recent"] == -(-len(expected) // twitter_ingest.PAGE_SIZE)
+
+    newest = max(int(i) for i in expected)
+    server.state.add_tweets(["the rally went on", "the end", "no match here"])
+    rows = twitter_ingest.run_ingest("the", base_url=url, bearer_token="test", since_id=newest)
+    assert sorted(r["tweet_text"] for r in rows) == ["the end", "the rally went on"]
+
+
+def test_paginate_waits_out_429_and_resumes_the_same_page():
+    server, url = twitter_stub.start_in_thread(n_tweets=450, rate_limit=2, window=1)
+    try:
+        client = twitter_ingest.SearchClient("test", url)
+        tweets = collect(client, "the", limit=250, backoff=0.05, max_wait=0.2, max_retries=30)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert server.state.hits["/2/tweets/search/recent"] > server.state.requests  # some got 429
+    ids = [t["id"] for t in tweets]
+    assert len(ids) == 250 and len(set(ids)) == 250
+    assert ids == sorted(ids, reverse=True)  # no page skipped or repeated
+
+
+def test_4xx_is_raised_not_retried(stub):
+    server, url = stub
+    with pytest.raises(urllib.error.HTTPError) as e:
+        collect(twitter_ingest.SearchClient("test", url), "  ")
+    assert e.value.code == 400
+    assert server.state.hits["/2/tweets/search/recent"] == 1
@@ -0,0 +1,80 @@
+"""
+QueryScheduler against the local stub (twitter_stub.py): resuming a poll cut
+off by 429, since_id between polls, and parking a query that gets a 4xx.
+
+    python -m pytest -q test_twitter_scheduler.py
+"""
+
+import time
+
+import pytest
+
+import twitter_scheduler
+import twitter_stub
+from twitter_ingest import SearchClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def stub():
+    server, url = twitter_stub.start_in_thread(n_tweets=800, rate_limit=3)
+    yield server, url
+    server.shutdown()
+    server.server_close()
+
+
+def make_scheduler(url, queries, window=60):
+    clock = FakeClock()
+    rows = []
+    scheduler = twitter_scheduler.QueryScheduler(
+        queries, client=SearchClient("test", url),
+        bucket=twitter_scheduler.TokenBucket(100, window, clock=clock),
+        on_rows=rows.extend, clock=clock, sleep=lambda s: None)
+    return scheduler, clock, rows
+
+
+def test_poll_resumes_after_429_and_then_only_fetches_new_tweets(stub):
+    server, url = stub
+    q = twitter_scheduler.ScheduledQuery("the", interval=30)
+    scheduler, clock, rows = make_scheduler(url, [q])
+    expected = {t["id"] for t in server.state.tweets if "the" in t["text"].lower()}
+    assert len(expected) > 3 * twitter_scheduler.PAGE_SIZE
+
+    scheduler.run_once()  # 3 pages, then 429
+    assert len(rows) == 3 * twitter_scheduler.PAGE_SIZE
+    assert q.next_token and q.since_id is None
+    assert scheduler.bucket.wait_time() > 0
+
+    server.state._used = 0  # the server's window reopens
+    clock.now = scheduler.bucket.blocked_until + 1
+    scheduler.run_once()
+    assert sorted(r["tweet_id"] for r in rows) == sorted(expected)
+    assert q.since_id == max(expected, key=int) and q.next_token is None
+
+    server.state.add_tweets(["the new one", "unrelated"])
+    clock.now += q.interval
+    scheduler.run_once()
+    assert [r["tweet_text"] for r in rows[len(expected):]] == ["the new one"]
+
+
+def test_4xx_parks_only_that_query_for_the_configured_window(stub):
+    server, url = stub
+    bad = twitter_scheduler.ScheduledQuery(" ", priority=1, interval=10)
+    good = twitter_scheduler.ScheduledQuery("dalit", interval=10)
+    scheduler, clock, rows = make_scheduler(url, [bad, good], window=120)
+    start = clock.now
+
+    scheduler.run_once()
+    assert bad.tweets == 0 and bad.next_due == start + 120
+    assert good.since_id is not None and rows
+    assert all(r["query"] == "dalit" for r in rows)
+
+    clock.now += 10
+    assert scheduler.due() == [good]
@@ -1,8 +1,10 @@
-import tweepy
-import pandas as pd
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import costitu2 as constitu2  # Importing the existing module
+import metrics
 
 # ---------------------------
 # Twitter API Setup
@@ -13,102 +15,194 @@ API_SECRET = os.getenv("TWITTER_API_SECRET", "dRZQrGA9CRfk9lmzCk5B5XQqUMKecr4Lqo
 ACCESS_TOKEN = os.getenv("TWITTER_ACCESS_TOKEN", "1958893707916451842-sWBbUZohzByzeoojFbOtOzP2yvzi4Z")
 ACCESS_TOKEN_SECRET = os.getenv("TWITTER_ACCESS_TOKEN_SECRET", "oJ5CTSdyHkUZnttAAZqruMcgaUR9H38yhMcfcuOeVJVeP")
 
-def get_twitter_client():
-    """Authenticates with Twitter API v2 using Consumer Keys and Access Tokens."""
-    if not all([API_KEY, API_SECRET, ACCESS_TOKEN, ACCESS_TOKEN_SECRET]):
-        print("⚠️  WARNING: One or more Twitter API credentials are missing.")
-        return None
-    
-    try:
-        client = tweepy.Client(
-            consumer_key=API_KEY,
-            consumer_secret=API_SECRET,
-            access_token=ACCESS_TOKEN,
-            access_token_secret=ACCESS_TOKEN_SECRET
+API_HOST = "https://api.twitter.com"
+BASE_URL = os.getenv("TWITTER_API_BASE_URL", API_HOST)
+POOL_SIZE = 10
+
+# tweepy, requests and pandas are imported where they are used, so scoring
+# (analyze_tweets) and the ingest/scheduler modules import without them.
+_ADAPTER_CLASS = None
+
+def _pooled_adapter(base_url=API_HOST, **kwargs):
+    """Keep-alive connection pool; optionally sends api.twitter.com requests to `base_url` (local mock)."""
+    global _ADAPTER_CLASS
+    if _ADAPTER_CLASS is None:
+        from requests.adapters import HTTPAdapter
+
+        class _PooledAdapter(HTTPAdapter):
+            def __init__(self, base_url=API_HOST, **kwargs):
+                self.base_url = base_url.rstrip("/")
+                super().__init__(**kwargs)
+
+            def send(self, request, **kwargs):
+                if self.base_url != API_HOST and request.url.startswith(API_HOST):
+                    request.url = self.base_url + request.url[len(API_HOST):]
+                return super().send(request, **kwargs)
+
+        _ADAPTER_CLASS = _PooledAdapter
+    return _ADAPTER_CLASS(base_url, **kwargs)
+
+class TwitterClientManager:
+    """Long-lived Twitter client: authenticates once, caches the `get_me()` identity and
+    reuses one pooled keep-alive HTTP session for every fetch.
+
+    `search_many` fans several queries out over that pool with a thread per connection.
+    A 429 raises right away (so `fetch_tweets` falls back to the timeline) unless
+    `wait_on_rate_limit=True`, which makes tweepy sleep until the window resets.
+    """
+
+    def __init__(self, api_key=API_KEY, api_secret=API_SECRET, access_token=ACCESS_TOKEN,
+                 access_token_secret=ACCESS_TOKEN_SECRET, pool_size=POOL_SIZE, base_url=BASE_URL,
+                 wait_on_rate_limit=False):
+        import tweepy
+
+        self.client = tweepy.Client(
+            consumer_key=api_key,
+            consumer_secret=api_secret,
+            access_token=access_token,
+            access_token_secret=access_token_secret,
+            wait_on_rate_limit=wait_on_rate_limit
         )
-        
-        # Verify credentials
-        me = client.get_me()
-        if me.data:
-            print(f"✅ Authenticated as: @{me.data.username}")
-        else:
-            print("⚠️  Authentication succeeded but could not fetch user details.")
-            
-        return client
-    except Exception as e:
-        print(f"❌ Error authenticating with Twitter: {e}")
-        return None
-
-def fetch_tweets(query, max_results=10):
-    """Fetches tweets matching the query."""
-    client = get_twitter_client()
-    if not client:
-        return []
+        self.pool_size = pool_size
+        adapter = _pooled_adapter(base_url, pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.client.session.mount(API_HOST, adapter)
+        self._me = None
+        self._me_lock = threading.Lock()
 
-    # API requires max_results to be between 10 and 100
-    if max_results < 10:
-        print("⚠️  max_results must be at least 10. Setting to 10.")
-        max_results = 10
-        
-    print(f"🔍 Searching for tweets matching: '{query}'...")
-    try:
-        # search_recent_tweets is for the standard v2 endpoint (requires Basic or Pro access usually, 
-        # but some levels allow it. If using Essential, might be limited).
-        response = client.search_recent_tweets(query=query, max_results=max_results, tweet_fields=["created_at", "lang"])
-        
-        if not response.data:
-            print("No tweets found.")
+    @property
+    def me(self):
+        """Authenticated user (tweepy User), fetched once; None if it could not be resolved."""
+        with self._me_lock:
+            if self._me is None:
+                response = self.client.get_me()
+                self._me = response.data or False
+            return self._me or None
+
+    def search(self, query, max_results=10):
+        """Fetches tweet texts matching the query (falls back to your own timeline)."""
+        # API requires max_results to be between 10 and 100
+        if max_results < 10:
+            print("⚠️  max_results must be at least 10. Setting to 10.")
+            max_results = 10
+
+        print(f"🔍 Searching for tweets matching: '{query}'...")
+        try:
+            # search_recent_tweets is for the standard v2 endpoint (requires Basic or Pro access usually, 
+            # but some levels allow it. If using Essential, might be limited).
+            with metrics.stage("fetch", source="search"):
+                response = self.client.search_recent_tweets(query=query, max_results=max_results, tweet_fields=["created_at", "lang"])
+            
+            if not response.data:
+                print("No tweets found.")
+                return []
+            
+            return [tweet.text for tweet in response.data]
+        except Exception as e:
+            print(f"❌ Error fetching tweets via search: {e}")
+            
+            # Fallback: Try fetching user's own tweets (Free Tier often allows this or at least 'get_me')
+            print("⚠️  Search failed (likely due to Free Tier limitations). Attempting to fetch your own recent tweets...")
+            try:
+                me = self.me
+                if me:
+                    with metrics.stage("fetch", source="timeline"):
+                        response = self.client.get_users_tweets(id=me.id, max_results=max_results, tweet_fields=["created_at", "lang"])
+                    if response.data:
+                        print(f"✅ Successfully fetched {len(response.data)} tweets from your timeline (@{me.username}).")
+                        return [tweet.text for tweet in response.data]
+                    else:
+                        print("No tweets found in your timeline.")
+                        return []
+            except Exception as e2:
+                print(f"❌ Error fetching user timeline: {e2}")
+                
             return []
+
+    def search_many(self, queries, max_results=10, max_workers=None):
+        """Runs several searches concurrently over the shared pool; returns {query: texts}."""
+        queries = list(dict.fromkeys(queries))
+        workers = max(1, min(max_workers or self.pool_size, len(queries) or 1))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            texts = pool.map(lambda q: self.search(q, max_results=max_results), queries)
+            return dict(zip(queries, texts))
+
+    def close(self):
+        self.client.session.close()
+
+_MANAGER = None
+_MANAGER_LOCK = threading.Lock()
+
+def get_client_manager():
+    """Returns the shared TwitterClientManager, authenticating on first use (None on failure)."""
+    global _MANAGER
+    with _MANAGER_LOCK:
+        if _MANAGER is not None:
+            return _MANAGER
+        if not all([API_KEY, API_SECRET, ACCESS_TOKEN, ACCESS_TOKEN_SECRET]):
+            print("⚠️  WARNING: One or more Twitter API credentials are missing.")
+            return None
         
-        return [tweet.text for tweet in response.data]
-    except Exception as e:
-        print(f"❌ Error fetching tweets via search: {e}")
-        
-        # Fallback: Try fetching user's own tweets (Free Tier often allows this or at least 'get_me')
-        print("⚠️  Search failed (likely due to Free Tier limitations). Attempting to fetch your own recent tweets...")
         try:
-            me = client.get_me()
-            if me.data:
-                response = client.get_users_tweets(id=me.data.id, max_results=max_results, tweet_fields=["created_at", "lang"])
-                if response.data:
-                    print(f"✅ Successfully fetched {len(response.data)} tweets from your timeline (@{me.data.username}).")
-                    return [tweet.text for tweet in response.data]
-                else:
-                    print("No tweets found in your timeline.")
-                    return []
-        except Exception as e2:
-            print(f"❌ Error fetching user timeline: {e2}")
+            manager = TwitterClientManager()
             
+            # Verify credentials (cached on the manager for later fallbacks)
+            me = manager.me
+            if me:
+                print(f"✅ Authenticated as: @{me.username}")
+            else:
+                print("⚠️  Authentication succeeded but could not fetch user details.")
+                
+            _MANAGER = manager
+            return manager
+        except Exception as e:
+            print(f"❌ Error authenticating with Twitter: {e}")
+            return None
+
+def get_twitter_client():
+    """Authenticates with Twitter API v2 using Consumer Keys and Access Tokens.
+
+    Returns the shared, already-authenticated tweepy.Client (see get_client_manager).
+    """
+    manager = get_client_manager()
+    return manager.client if manager else None
+
+def fetch_tweets(query, max_results=10, manager=None):
+    """Fetches tweets matching the query, reusing the shared authenticated client."""
+    manager = manager or get_client_manager()
+    if not manager:
         return []
+    return manager.search(query, max_results=max_results)
 
-def analyze_tweets(tweets):
-    """Applies constitu2 analysis on a list of tweet texts."""
+def fetch_many(queries, max_results=10, manager=None, max_workers=None):
+    """Fetches several queries at once over the shared connection pool; returns {query: texts}."""
+    manager = manager or get_client_manager()
+    if not manager:
+        return {}
+    return manager.search_many(queries, max_results=max_results, max_workers=max_workers)
+
+def analyze_tweets(tweets, matcher=None, cache=None):
+    """Applies constitu2 analysis on a list of tweet texts.
+
+    `cache` is an optional score_cache.ScoreCache; repeated texts (retweets,
+    copy-paste campaigns) are then scored once.
+    """
     results = []
+    # Build the KB matcher once for the whole batch
+    matcher = matcher or constitu2.get_bias_matcher()
+    start = time.perf_counter() if metrics.ENABLED else None
     
     for text in tweets:
-        # Use the constitution_aware_decode function from constitu2.py
-        # We assume the function signature matches what we saw in the file.
-        analysis = constitu2.constitution_aware_decode(text)
-        
-        # Extract relevant fields
-        # The analysis returns a dict with keys like 'candidates', 'selected', 'violated', etc.
-        # Since we are analyzing an existing text (the tweet), not generating one, 
-        # we might need to adapt how we interpret 'candidates'. 
-        # However, constitu2.constitution_aware_decode generates candidates *based on* the input prompt.
-        # Wait, looking at constitu2.py:
-        # simulated_generator(prompt) -> creates templates like "The {prompt} are lazy..."
-        # This seems to be designed to TEST prompts for bias, not analyze existing text for bias directly.
-        # 
-        # IF the user wants to analyze the TWEET itself for bias:
-        # We should use `bias_score(tweet_text)` and `toxicity_score(tweet_text)` directly.
-        # 
-        # Let's look at constitu2.py again.
-        # bias_score(text) -> returns count, matches
-        # toxicity_score(text) -> returns score
+        # constitution_aware_decode generates and scores template candidates *from* a prompt,
+        # which is for testing prompts; a tweet is analyzed directly with score_text
+        # (bias, toxicity and fluency from one pass over the text).
         
-        bcount, bmatches = constitu2.bias_score(text)
-        tox = constitu2.toxicity_score(text)
-        flu = constitu2.fluency_score(text)
+        if cache is not None:
+            bmatches, tox, flu = cache.score(text)
+            bcount = len(bmatches)
+        else:
+            scores = constitu2.score_text(text, matcher)
+            bcount, bmatches = scores["bias_count"], scores["bias_matches"]
+            tox, flu = scores["toxicity"], scores["fluency"]
         
         # Determine violation based on thresholds in constitu2 (defaults: bias > 1 or tox > 0.2)
         violated = bcount > 1 or tox > 0.2
@@ -118,13 +212,35 @@ def analyze_tweets(tweets):
         results.append({
             "tweet_text": text,
             "bias_count": bcount,
-            "bias_matches": ", ".join([f"{m[0]}({m[1]})" for m in bmatches]) if bmatches else "",
+            "bias_matches": constitu2.format_matches(bmatches),
             "toxicity": round(tox, 3),
             "fluency": round(flu, 3),
             "violated": violated,
             "justification": justification
         })
         
+    if start is not None:
+        elapsed = time.perf_counter() - start
+        metrics.observe("stage_seconds", elapsed, stage="analyze")
+        metrics.inc("rows_scored_total", len(results))
+        if elapsed > 0:
+            metrics.set_gauge("rows_per_second", len(results) / elapsed)
+    return results
+
+def classify_tweets(tweets, matcher=None):
+    """Classify-only counterpart of analyze_tweets for routing: just the safe/violated verdict.
+
+    Uses constitu2.classify_text, which stops scanning a tweet once its verdict is certain,
+    so no bias_count / bias_matches / toxicity / fluency columns are produced.
+    """
+    results = []
+    for text in tweets:
+        violated = constitu2.classify_text(text, matcher)
+        results.append({
+            "tweet_text": text,
+            "violated": violated,
+            "justification": "Violated thresholds" if violated else "Safe"
+        })
     return results
 
 def save_results(results, filename="twitter_analysis_results.csv"):
@@ -132,6 +248,8 @@ def save_results(results, filename="twitter_analysis_results.csv"):
         print("No results to save.")
         return
 
+    import pandas as pd
+
     df = pd.DataFrame(results)
     
     # Segregate into Violated and Safe
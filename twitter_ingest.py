@@ -0,0 +1,280 @@
+"""
+twitter_ingest.py
+
+Asyncio ingest pipeline for the Twitter API v2 recent-search endpoint.
+
+- `paginate` follows `next_token` past the 100-tweet page cap and yields tweets
+  as each page arrives.
+- `ingest` feeds those tweets into a bounded queue drained by scoring workers,
+  so waiting on the network and scoring (`twitter_analysis.analyze_tweets`)
+  overlap instead of running one after the other.
+- `x-rate-limit-remaining` / `x-rate-limit-reset` are honoured: when the window
+  is spent the pipeline sleeps until the reset instead of failing, and 429 /
+  5xx responses are retried with backoff.
+
+Requests go through a plain urllib client with a configurable `base_url`, so
+the whole pipeline can be run against `twitter_stub.py`:
+
+    python twitter_stub.py --port 8765 --tweets 5000
+    python twitter_ingest.py --query election --limit 2000 --base-url http://127.0.0.1:8765
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+import twitter_analysis
+
+DEFAULT_BASE_URL = os.getenv("TWITTER_API_BASE_URL", "https://api.twitter.com")
+BEARER_TOKEN = os.getenv("TWITTER_BEARER_TOKEN", "")
+SEARCH_PATH = "/2/tweets/search/recent"
+PAGE_SIZE = 100  # API maximum for max_results
+
+
+# ---------------------------
+# HTTP client
+# ---------------------------
+class RateLimited(Exception):
+    """Raised on HTTP 429; `reset_at` is the epoch second the window reopens (or None)."""
+
+    def __init__(self, reset_at=None):
+        super().__init__(f"rate limited until {reset_at}")
+        self.reset_at = reset_at
+
+
+class TransientError(Exception):
+    """Raised on 5xx responses and connection errors; safe to retry."""
+
+
+def _header_int(headers, name):
+    value = headers.get(name) if headers is not None else None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class SearchClient:
+    """Blocking client for GET /2/tweets/search/recent with app-only (bearer) auth.
+
+    After every response `remaining` / `reset_at` hold the latest rate-limit headers.
+    """
+
+    def __init__(self, bearer_token=BEARER_TOKEN, base_url=DEFAULT_BASE_URL, timeout=30):
+        self.bearer_token = bearer_token
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.remaining = None
+        self.reset_at = None
+
+    def _get(self, path, params):
+        url = f"{self.base_url}{path}?{urllib.parse.urlencode(params)}"
+        request = urllib.request.Request(url, headers={
+            "Authorization": f"Bearer {self.bearer_token}",
+            "User-Agent": "costitu2-ingest",
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                self._update_limits(response.headers)
+                return json.loads(response.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            self._update_limits(e.headers)
+            if e.code == 429:
+                raise RateLimited(_header_int(e.headers, "x-rate-limit-reset")) from e
+            if e.code >= 500:
+                raise TransientError(f"HTTP {e.code}") from e
+            raise
+        except (urllib.error.URLError, ConnectionError, TimeoutError) as e:
+            raise TransientError(str(e)) from e
+
+    def _update_limits(self, headers):
+        remaining = _header_int(headers, "x-rate-limit-remaining")
+        if remaining is not None:
+            self.remaining = remaining
+            self.reset_at = _header_int(headers, "x-rate-limit-reset")
+
+    def wait_time(self):
+        """Seconds to wait before the next request (0 unless the window is spent)."""
+        if self.remaining == 0 and self.reset_at:
+            return max(0.0, self.reset_at - time.time())
+        return 0.0
+
+    def search_recent(self, query, max_results=PAGE_SIZE, next_token=None, since_id=None,
+                      tweet_fields=("created_at", "lang")):
+        """Fetch one page; returns the decoded JSON body (`data`, `meta`)."""
+        params = {"query": query, "max_results": max(10, min(PAGE_SIZE, max_results))}
+        if tweet_fields:
+            params["tweet.fields"] = ",".join(tweet_fields)
+        if next_token:
+            params["next_token"] = next_token
+        if since_id:
+            params["since_id"] = since_id
+        return self._get(SEARCH_PATH, params)
+
+
+# ---------------------------
+# Async pagination
+# ---------------------------
+async def paginate(client, query, limit=None, page_size=PAGE_SIZE, since_id=None,
+                   max_retries=5, backoff=1.0, max_wait=900):
+    """Async generator over tweets (dicts with `id`, `text`, ...) for `query`, newest first.
+
+    Follows `meta.next_token` until the results (or `limit`) run out. Blocking
+    HTTP calls run in the default thread executor so the event loop stays free.
+    """
+    loop = asyncio.get_running_loop()
+    next_token = None
+    fetched = 0
+    retries = 0
+    while True:
+        wait = min(client.wait_time(), max_wait)
+        if wait > 0:
+            print(f"⏳ Rate limit window spent; sleeping {wait:.0f}s until reset.")
+            await asyncio.sleep(wait)
+
+        size = page_size if limit is None else max(10, min(page_size, limit - fetched))
+        fetch = functools.partial(client.search_recent, query, max_results=size,
+                                  next_token=next_token, since_id=since_id)
+        try:
+            with metrics.stage("fetch", source="ingest"):
+                page = await loop.run_in_executor(None, fetch)
+        except (RateLimited, TransientError) as e:
+            retries += 1
+            if retries > max_retries:
+                raise
+            delay = backoff * 2 ** (retries - 1)
+            if isinstance(e, RateLimited) and e.reset_at:
+                delay = max(delay, e.reset_at - time.time())
+            delay = min(delay, max_wait)
+            print(f"⚠️  {e}; retrying in {delay:.1f}s ({retries}/{max_retries}).")
+            if metrics.ENABLED:
+                metrics.inc("fetch_retries_total", reason=type(e).__name__)
+            await asyncio.sleep(delay)
+            continue
+        retries = 0
+
+        for tweet in page.get("data", []):
+            yield tweet
+            fetched += 1
+            if limit is not None and fetched >= limit:
+                return
+        next_token = page.get("meta", {}).get("next_token")
+        if not next_token:
+            return
+
+
+# ---------------------------
+# Producer / consumer pipeline
+# ---------------------------
+def _analyze_page(tweets):
+    """Score a batch of tweet dicts; module-level so it can run in a process pool."""
+    rows = twitter_analysis.analyze_tweets([t["text"] for t in tweets])
+    for tweet, row in zip(tweets, rows):
+        row["tweet_id"] = tweet.get("id")
+        row["created_at"] = tweet.get("created_at")
+    return rows
+
+
+async def ingest(client, query, limit=None, page_size=PAGE_SIZE, since_id=None,
+                 queue_size=500, batch_size=50, consumers=2, executor=None, on_rows=None):
+    """Fetch `query` page by page while scoring workers drain a bounded queue.
+
+    `queue_size` bounds how far fetching may run ahead of scoring (the producer
+    blocks when it is full). Each consumer scores up to `batch_size` queued tweets
+    at a time in `executor` (None = default thread pool; pass a
+    ProcessPoolExecutor for CPU parallelism). `on_rows(rows)` is called for each
+    scored batch; all rows are also returned, in completion order.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=queue_size)
+    results = []
+
+    async def produce():
+        try:
+            async for tweet in paginate(client, query, limit=limit, page_size=page_size,
+                                        since_id=since_id):
+                await queue.put(tweet)
+                if metrics.ENABLED:
+                    metrics.set_gauge("queue_depth", queue.qsize(), queue="ingest")
+        finally:
+            for _ in range(consumers):
+                await queue.put(None)
+
+    async def flush(batch):
+        rows = await loop.run_in_executor(executor, _analyze_page, batch)
+        results.extend(rows)
+        if on_rows is not None:
+            on_rows(rows)
+
+    async def consume():
+        batch = []
+        while True:
+            tweet = await queue.get()
+            if tweet is None:
+                break
+            batch.append(tweet)
+            # score as soon as the queue runs dry so results don't wait on the network
+            if len(batch) >= batch_size or queue.empty():
+                await flush(batch)
+                batch = []
+        if batch:
+            await flush(batch)
+
+    await asyncio.gather(produce(), *(consume() for _ in range(consumers)))
+    return results
+
+
+def run_ingest(query, limit=None, base_url=DEFAULT_BASE_URL, bearer_token=BEARER_TOKEN,
+               processes=0, **kwargs):
+    """Synchronous entry point: returns analyze_tweets-style rows (plus tweet_id / created_at)."""
+    client = SearchClient(bearer_token, base_url)
+    if processes:
+        with ProcessPoolExecutor(processes) as executor:
+            return asyncio.run(ingest(client, query, limit=limit, executor=executor, **kwargs))
+    return asyncio.run(ingest(client, query, limit=limit, **kwargs))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Page through recent-search results and score tweets as they arrive.")
+    parser.add_argument("--query", required=True, help="search query")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many tweets (default: all pages)")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL, help="API base URL (point at twitter_stub.py for local runs)")
+    parser.add_argument("--since-id", default=None, help="only return tweets newer than this id")
+    parser.add_argument("--queue-size", type=int, default=500, help="max tweets fetched ahead of scoring")
+    parser.add_argument("--batch-size", type=int, default=50, help="max tweets per scoring call")
+    parser.add_argument("--consumers", type=int, default=2, help="concurrent scoring workers")
+    parser.add_argument("--processes", type=int, default=0, help="score in a process pool of this size (0 = threads)")
+    parser.add_argument("--output", default="twitter_analysis_results.csv")
+    parser.add_argument("--metrics", default=None,
+                        help="record stage timings, counters and queue depth and write them here (.prom or JSON)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.metrics:
+        metrics.enable()
+    if not BEARER_TOKEN and args.base_url == "https://api.twitter.com":
+        print("⚠️  WARNING: TWITTER_BEARER_TOKEN is not set.")
+    start = time.perf_counter()
+    results = run_ingest(args.query, limit=args.limit, base_url=args.base_url,
+                         since_id=args.since_id, queue_size=args.queue_size,
+                         batch_size=args.batch_size, consumers=args.consumers,
+                         processes=args.processes)
+    elapsed = time.perf_counter() - start
+    print(f"⏱️  {len(results)} tweets fetched and scored in {elapsed:.2f}s")
+    twitter_analysis.save_results(results, args.output)
+    if args.metrics:
+        metrics.dump(args.metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+twitter_scheduler.py
+
+Headless multi-query poller for the Twitter API v2 recent-search endpoint.
+
+- Each query has a priority and a polling interval.
+- All queries share one token bucket sized to the API rate window (one token per
+  request), kept in sync with the `x-rate-limit-*` headers of every response.
+- Each query remembers its `since_id`, so a poll only fetches tweets newer than
+  the last one seen. A poll interrupted by an empty bucket resumes from its
+  `next_token` on the next turn instead of starting over.
+- When more queries are due than the budget allows, higher priority goes first,
+  then the query that has recently yielded the most new tweets per request.
+- New tweets are scored with `twitter_analysis.analyze_tweets` and appended to a CSV.
+  With `--kb-dir` the KB is read from files and reloaded on change (kb_live.py);
+  rows then also carry the `kb_version` they were scored with.
+
+    python twitter_stub.py --port 8765 --tweets 5000 --rate-limit 180 --window 60
+    python twitter_scheduler.py --queries queries.json --base-url http://127.0.0.1:8765 --rate-limit 180 --window 60 --duration 300
+
+`queries.json` is a list of {"query": ..., "priority": 0, "interval": 60} objects
+(or plain query strings).
+"""
+
+import argparse
+import json
+import os
+import time
+import urllib.error
+
+import twitter_analysis
+from twitter_ingest import BEARER_TOKEN, DEFAULT_BASE_URL, PAGE_SIZE, RateLimited, SearchClient, TransientError
+
+RATE_LIMIT = 450   # recent-search requests per window (app auth)
+RATE_WINDOW = 900  # seconds
+
+
+# ---------------------------
+# Rate budget
+# ---------------------------
+class TokenBucket:
+    """`capacity` requests per `window` seconds, refilled continuously."""
+
+    def __init__(self, capacity=RATE_LIMIT, window=RATE_WINDOW, clock=time.time):
+        self.capacity = capacity
+        self.window = window
+        self.rate = capacity / window
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated = clock()
+        self.blocked_until = 0.0
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return now
+
+    def take(self):
+        """Spend one token if available; returns True on success."""
+        now = self._refill()
+        if now < self.blocked_until or self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def wait_time(self):
+        """Seconds until a token is available."""
+        now = self._refill()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def sync(self, remaining, reset_at):
+        """Align with the server's view: never assume more budget than it reports."""
+        self._refill()
+        if remaining is not None:
+            self.tokens = min(self.tokens, float(remaining))
+            if remaining == 0 and reset_at:
+                self.blocked_until = max(self.blocked_until, float(reset_at))
+
+
+# ---------------------------
+# Queries
+# ---------------------------
+class ScheduledQuery:
+    """One tracked search term and its polling state."""
+
+    def __init__(self, query, priority=0, interval=60):
+        self.query = query
+        self.priority = priority
+        self.interval = interval
+        self.since_id = None
+        self.next_due = 0.0
+        # poll in progress: pagination token and the newest id seen on its first page
+        self.next_token = None
+        self.pending_newest = None
+        # moving average of new tweets per request, used to rank equally-prioritized queries
+        self.yield_rate = float(PAGE_SIZE)
+        self.requests = 0
+        self.tweets = 0
+
+    def rank(self):
+        return (-self.priority, -self.yield_rate, self.next_due)
+
+
+def load_queries(path):
+    """Read a JSON list of query strings or {"query", "priority", "interval"} objects."""
+    with open(path, encoding="utf-8") as f:
+        items = json.load(f)
+    queries = []
+    for item in items:
+        if isinstance(item, str):
+            item = {"query": item}
+        queries.append(ScheduledQuery(item["query"], item.get("priority", 0), item.get("interval", 60)))
+    return queries
+
+
+# ---------------------------
+# Scheduler
+# ---------------------------
+class QueryScheduler:
+    """Polls many queries against one shared rate budget and scores what comes back.
+
+    `on_rows(rows)` receives analyze_tweets rows (plus `query` and `tweet_id`) for
+    every page with new tweets. `clock` / `sleep` can be replaced for simulation.
+    With a `live_kb` (kb_live.LiveKB) each page is scored with its current
+    matcher and rows also get `kb_version`.
+    """
+
+    def __init__(self, queries, client=None, bucket=None, on_rows=None, matcher=None,
+                 max_pages=10, clock=time.time, sleep=time.sleep, live_kb=None):
+        self.queries = list(queries)
+        self.client = client or SearchClient()
+        self.bucket = bucket or TokenBucket(clock=clock)
+        self.on_rows = on_rows
+        self.matcher = matcher
+        self.live_kb = live_kb
+        self.max_pages = max_pages
+        self.clock = clock
+        self.sleep = sleep
+        self.requests = 0
+        self.tweets = 0
+
+    def due(self):
+        now = self.clock()
+        return sorted((q for q in self.queries if q.next_due <= now), key=ScheduledQuery.rank)
+
+    def _fetch_page(self, q):
+        page = self.client.search_recent(q.query, max_results=PAGE_SIZE,
+                                         next_token=q.next_token, since_id=q.since_id)
+        self.requests += 1
+        q.requests += 1
+        return page
+
+    def poll(self, q):
+        """Fetch new tweets for `q` while budget lasts; returns the number of new tweets.
+
+        If the budget or page cap runs out mid-poll, `q` stays due and the next
+        turn continues from its `next_token`; `since_id` only advances once every
+        page of the poll has been fetched.
+        """
+        new = 0
+        for _ in range(self.max_pages):
+            if not self.bucket.take():
+                return new
+            try:
+                page = self._fetch_page(q)
+            except RateLimited as e:
+                self.bucket.sync(0, e.reset_at or self.clock() + 60)
+                return new
+            except TransientError as e:
+                print(f"⚠️  '{q.query}': {e}; retrying later.")
+                q.next_due = self.clock() + min(q.interval, 30)
+                return new
+            except urllib.error.HTTPError as e:
+                # 4xx (bad query, revoked or missing access): won't fix itself soon, so
+                # park this query for a rate window and start its next poll afresh
+                park = max(q.interval, self.bucket.window)
+                print(f"⚠️  '{q.query}': HTTP {e.code} {e.reason}; skipping it for {park:.0f}s.")
+                q.next_token = q.pending_newest = None
+                q.next_due = self.clock() + park
+                return new
+            finally:
+                self.bucket.sync(self.client.remaining, self.client.reset_at)
+
+            tweets = page.get("data", [])
+            meta = page.get("meta", {})
+            if q.pending_newest is None:
+                q.pending_newest = meta.get("newest_id") or (tweets[0]["id"] if tweets else None)
+            if tweets:
+                self._score(q, tweets)
+                new += len(tweets)
+            q.next_token = meta.get("next_token")
+            if not q.next_token:
+                if q.pending_newest is not None:
+                    q.since_id = q.pending_newest
+                q.pending_newest = None
+                q.next_due = self.clock() + q.interval
+                return new
+        return new
+
+    def _score(self, q, tweets):
+        matcher = self.live_kb.matcher if self.live_kb is not None else self.matcher
+        rows = twitter_analysis.analyze_tweets([t["text"] for t in tweets], matcher=matcher)
+        for tweet, row in zip(tweets, rows):
+            row["query"] = q.query
+            row["tweet_id"] = tweet["id"]
+            if self.live_kb is not None:
+                row["kb_version"] = matcher.version
+        q.tweets += len(rows)
+        self.tweets += len(rows)
+        if self.on_rows is not None:
+            self.on_rows(rows)
+
+    def run_once(self):
+        """Poll every due query the budget allows, best-ranked first; returns new tweets."""
+        new = 0
+        for q in self.due():
+            if self.bucket.wait_time() > 0:
+                break
+            before = q.requests
+            got = self.poll(q)
+            new += got
+            spent = q.requests - before
+            if spent:
+                q.yield_rate = 0.7 * q.yield_rate + 0.3 * (got / spent)
+        return new
+
+    def run(self, duration=None, max_requests=None):
+        """Poll until `duration` seconds pass or `max_requests` are spent (None = forever)."""
+        deadline = None if duration is None else self.clock() + duration
+        while True:
+            self.run_once()
+            if max_requests is not None and self.requests >= max_requests:
+                break
+            now = self.clock()
+            if deadline is not None and now >= deadline:
+                break
+            next_due = min(q.next_due for q in self.queries)
+            wait = max(next_due - now, self.bucket.wait_time(), 0.05)
+            if deadline is not None:
+                wait = min(wait, deadline - now)
+            self.sleep(wait)
+        return self.tweets
+
+
+def append_csv(path):
+    """on_rows callback that appends scored rows to `path` (header written once)."""
+    import pandas as pd
+
+    def write(rows):
+        new_file = not os.path.exists(path)
+        pd.DataFrame(rows).to_csv(path, mode="a", header=new_file, index=False,
+                                  encoding="utf-8-sig" if new_file else "utf-8")
+    return write
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Poll many search queries under one shared rate budget.")
+    parser.add_argument("--queries", help="JSON file of queries (strings or {query, priority, interval})")
+    parser.add_argument("--query", action="append", default=[], help="extra query (repeatable)")
+    parser.add_argument("--interval", type=float, default=60, help="default polling interval in seconds")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--rate-limit", type=int, default=RATE_LIMIT, help="requests per rate window")
+    parser.add_argument("--window", type=float, default=RATE_WINDOW, help="rate window in seconds")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--output", default="twitter_scheduler_results.csv")
+    parser.add_argument("--kb-dir", default=None, help="load the KB from this directory and reload it on change")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    queries = load_queries(args.queries) if args.queries else []
+    queries += [ScheduledQuery(q, interval=args.interval) for q in args.query]
+    if not queries:
+        raise SystemExit("No queries given (use --queries or --query).")
+
+    live_kb = None
+    if args.kb_dir:
+        import kb_live
+
+        live_kb = kb_live.LiveKB(args.kb_dir)
+        live_kb.start_watching()
+    scheduler = QueryScheduler(
+        queries,
+        client=SearchClient(BEARER_TOKEN, args.base_url),
+        bucket=TokenBucket(args.rate_limit, args.window),
+        on_rows=append_csv(args.output),
+        live_kb=live_kb,
+    )
+    start = time.perf_counter()
+    try:
+        scheduler.run(duration=args.duration)
+    except KeyboardInterrupt:
+        pass
+    print(f"📊 {scheduler.tweets} new tweets from {scheduler.requests} requests "
+          f"in {time.perf_counter() - start:.0f}s -> {args.output}")
+    for q in sorted(queries, key=ScheduledQuery.rank):
+        print(f"   {q.query!r}: {q.tweets} tweets / {q.requests} requests (since_id={q.since_id})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+twitter_stub.py
+
+Local stand-in for the Twitter API v2 recent-search endpoint, for exercising
+the ingest / client / scheduler code without network access or credentials.
+
+- GET /2/tweets/search/recent with query, max_results, next_token, since_id
+  (an empty query gets 400, like the real endpoint)
+- GET /2/users/me
+- x-rate-limit-* headers; 429 once a window's budget is spent
+- optional per-request latency
+
+Run standalone:
+
+    python twitter_stub.py --port 8765 --tweets 5000
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_TEXTS = [
+    "Election rally in the city today, huge turnout",
+    "Some people are just lazy and stupid",
+    "Dalit communities face challenges in rural areas",
+    "Brahmin and Dalit leaders met at the temple",
+    "The festival was celebrated with joy",
+    "Congress and BJP workers clashed outside the office",
+    "Farmers demand better prices for their crops",
+    "मुसलमान और हिन्दू साथ में त्योहार मनाते हैं",
+    "తెలుగు ప్రజలు ఎన్నికల్లో ఓటు వేశారు",
+    "Muslim and Hindu neighbours helped each other",
+]
+
+
+def _tweet(tweet_id, text):
+    return {"id": str(tweet_id), "text": text, "lang": "en",
+            "edit_history_tweet_ids": [str(tweet_id)]}
+
+
+class StubState:
+    """Tweets and rate-limit bookkeeping shared by all requests."""
+
+    def __init__(self, n_tweets=1000, rate_limit=450, window=900, latency=0.0, seed=0):
+        rng = random.Random(seed)
+        # newest first, like the real endpoint; ids increase with time
+        self.tweets = [
+            _tweet(10**15 + i, f"{rng.choice(SAMPLE_TEXTS)} #{i}")
+            for i in range(n_tweets)
+        ][::-1]
+        self.rate_limit = rate_limit
+        self.window = window
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = set()
+        self.hits = Counter()  # requests served per path
+        self._window_start = time.time()
+        self._used = 0
+
+    def add_tweets(self, texts):
+        """Publish new tweets (they become the newest results)."""
+        with self.lock:
+            next_id = int(self.tweets[0]["id"]) + 1 if self.tweets else 10**15
+            new = [_tweet(next_id + i, t) for i, t in enumerate(texts)]
+            self.tweets = new[::-1] + self.tweets
+
+    def take_budget(self):
+        """Return (allowed, remaining, reset_epoch) for one request."""
+        with self.lock:
+            now = time.time()
+            if now - self._window_start >= self.window:
+                self._window_start, self._used = now, 0
+            reset = int(self._window_start + self.window) + 1
+            if self._used >= self.rate_limit:
+                return False, 0, reset
+            self._used += 1
+            self.requests += 1
+            return True, self.rate_limit - self._used, reset
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None  # set by make_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload, remaining, reset):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("x-rate-limit-limit", str(self.state.rate_limit))
+        self.send_header("x-rate-limit-remaining", str(remaining))
+        self.send_header("x-rate-limit-reset", str(reset))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        state = self.state
+        with state.lock:
+            state.connections.add(self.client_address)
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        if state.latency:
+            time.sleep(state.latency)
+        allowed, remaining, reset = state.take_budget()
+        with state.lock:
+            state.hits[url.path] += 1
+        if not allowed:
+            self._send(429, {"title": "Too Many Requests", "status": 429}, remaining, reset)
+            return
+        if not self.headers.get("Authorization"):
+            self._send(401, {"title": "Unauthorized", "status": 401}, remaining, reset)
+            return
+
+        if url.path == "/2/users/me":
+            self._send(200, {"data": {"id": "1", "name": "Stub", "username": "stub_user"}}, remaining, reset)
+            return
+        if url.path != "/2/tweets/search/recent":
+            self._send(404, {"title": "Not Found", "status": 404}, remaining, reset)
+            return
+
+        query = params.get("query", "").lower()
+        if not query.strip():
+            self._send(400, {"title": "Invalid Request", "status": 400,
+                             "detail": "query must not be empty"}, remaining, reset)
+            return
+        max_results = max(10, min(100, int(params.get("max_results", 10))))
+        offset = int(params.get("next_token", "0") or 0)
+        since_id = int(params.get("since_id", "0") or 0)
+        with state.lock:
+            tweets = list(state.tweets)
+        words = [w for w in query.split() if not w.startswith("-")]
+        matching = [
+            t for t in tweets
+            if int(t["id"]) > since_id and all(w in t["text"].lower() for w in words)
+        ]
+        page = matching[offset:offset + max_results]
+        meta = {"result_count": len(page)}
+        if page:
+            meta["newest_id"], meta["oldest_id"] = page[0]["id"], page[-1]["id"]
+        if offset + max_results < len(matching):
+            meta["next_token"] = str(offset + max_results)
+        payload = {"meta": meta}
+        if page:
+            payload["data"] = page
+        self._send(200, payload, remaining, reset)
+
+
+def make_server(host="127.0.0.1", port=0, **state_kwargs):
+    """Build (but do not start) a stub server; port 0 picks a free port."""
+    state = StubState(**state_kwargs)
+    handler = type("BoundStubHandler", (StubHandler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.state = state
+    return server
+
+
+def start_in_thread(**kwargs):
+    """Start a stub server on a background thread; returns (server, base_url)."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub of the Twitter v2 recent-search endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tweets", type=int, default=1000)
+    parser.add_argument("--rate-limit", type=int, default=450, help="requests per window")
+    parser.add_argument("--window", type=int, default=900, help="rate-limit window in seconds")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    args = parser.parse_args()
+    server = make_server(args.host, args.port, n_tweets=args.tweets, rate_limit=args.rate_limit,
+                         window=args.window, latency=args.latency)
+    print(f"Stub Twitter API on http://{args.host}:{server.server_address[1]}")
+    server.serve_forever()